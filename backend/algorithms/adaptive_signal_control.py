@@ -0,0 +1,97 @@
+from .traffic_light_optimizer import intersection_demand, green_split, check_green_limits
+
+class AdaptiveSignalController:
+    """
+    Actuated signal control run inside every simulation step. Only
+    intersections fed by roads whose density changed this step are checked,
+    and only those whose north-south share of demand moved by more than
+    `threshold` since their last re-optimization get new green times.
+    """
+    def __init__(self, city_graph, threshold=0.1, min_green=15, max_green=60, cycle_time=60):
+        """
+        Args:
+            city_graph: CityGraph object
+            threshold: Change in north-south demand share (0-1) that marks an
+                intersection dirty
+            min_green: Minimum green time per direction
+            max_green: Maximum green time per direction
+            cycle_time: Total cycle time split between the two directions
+        
+        Raises:
+            ValueError: If the cycle cannot be split within the green limits
+        """
+        check_green_limits(min_green, max_green, cycle_time)
+        
+        self.city_graph = city_graph
+        self.threshold = threshold
+        self.min_green = min_green
+        self.max_green = max_green
+        self.cycle_time = cycle_time
+
+        self.applied_share = {}  # intersection -> north-south share last applied
+        self._light_by_road = None
+        self.reoptimized_total = 0
+
+    def reset(self):
+        self.applied_share = {}
+
+    def _lights_fed_by(self, road_ids):
+        """Signalized intersections at the end of the given roads"""
+        if self._light_by_road is None:
+            lights = self.city_graph.traffic_lights
+            self._light_by_road = {
+                data['road_id']: target
+                for source, target, data in self.city_graph.graph.edges(data=True)
+                if target in lights
+            }
+
+        intersections = set()
+        for road_id in road_ids:
+            intersection = self._light_by_road.get(road_id)
+            if intersection is not None:
+                intersections.add(intersection)
+        return intersections
+
+    def _current_share(self, intersection):
+        light = self.city_graph.traffic_lights[intersection]
+        ns_green = light['north_south']['green_time']
+        total = ns_green + light['east_west']['green_time']
+        return ns_green / total if total else 0.5
+
+    def update(self, traffic_data, changed_roads):
+        """
+        Re-optimize the intersections whose demand crossed the threshold.
+
+        Args:
+            traffic_data: Dictionary of current traffic density on each road
+            changed_roads: Road IDs whose density changed this step
+
+        Returns:
+            Dictionary of new timings for the re-optimized intersections
+        """
+        new_timings = {}
+        shares = {}
+
+        for intersection in self._lights_fed_by(changed_roads):
+            ns_density, ew_density = intersection_demand(self.city_graph, intersection, traffic_data)
+            total = ns_density + ew_density
+            share = ns_density / total if total > 0 else 0.5
+
+            last_share = self.applied_share.get(intersection)
+            if last_share is None:
+                last_share = self._current_share(intersection)
+            if abs(share - last_share) < self.threshold:
+                continue
+
+            ns_green, ew_green = green_split(
+                ns_density, ew_density, self.min_green, self.max_green, self.cycle_time
+            )
+            new_timings[intersection] = {"north_south": ns_green, "east_west": ew_green}
+            shares[intersection] = share
+
+        if new_timings:
+            self.city_graph.update_traffic_light_timings(new_timings)
+            self.applied_share.update(shares)
+            self.reoptimized_total += len(new_timings)
+
+        return new_timings
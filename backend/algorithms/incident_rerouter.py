@@ -0,0 +1,73 @@
+from .vehicle_router import reroute_vehicles_batch
+
+class IncidentRerouter:
+    """
+    Reroutes only the vehicles an incident actually affects. When an incident
+    appears, the simulator's route index yields the vehicles whose remaining
+    route uses the incident road; when it expires, the vehicles that were
+    detoured around it are routed again so they can use the road.
+    """
+    def __init__(self, auto=False):
+        """
+        Args:
+            auto: Run after every simulator step instead of only on demand
+        """
+        self.auto = auto
+        self.detoured = {}  # road_id -> vehicles rerouted away from it
+        self.rerouted_total = 0
+
+    def reset(self):
+        self.detoured = {}
+
+    def process(self, simulator):
+        """
+        Handle the incident events queued since the last call.
+
+        Returns:
+            Dictionary of new routes for the rerouted vehicles
+        """
+        events = simulator.drain_incident_events()
+        if not events:
+            return {}
+
+        # An incident can be gone by the time its addition is processed;
+        # its road is clear again, so nobody needs to avoid it
+        active = {id(incident) for incident in simulator.get_incidents()}
+
+        affected = set()
+        blocked = {}  # road_id -> vehicles planning to use it
+        for kind, incident in events:
+            road_id = incident['road_id']
+            if kind == 'added':
+                if id(incident) not in active:
+                    continue
+                blocked[road_id] = simulator.route_index.vehicles_on(road_id)
+                affected |= blocked[road_id]
+            else:
+                affected |= self.detoured.pop(road_id, set())
+
+        vehicles = {
+            vehicle_id: simulator.vehicles[vehicle_id]
+            for vehicle_id in affected
+            if vehicle_id in simulator.vehicles
+        }
+        if not vehicles:
+            return {}
+
+        new_routes = reroute_vehicles_batch(
+            simulator.city_graph,
+            vehicles,
+            simulator.get_traffic_density(),
+            simulator.get_incidents()
+        )
+        simulator.update_vehicle_routes(new_routes)
+        self.rerouted_total += len(new_routes)
+
+        # Remember who now avoids a blocked road so they can return when it clears
+        for road_id, planned in blocked.items():
+            still_using = simulator.route_index.vehicles_by_road.get(road_id, ())
+            for vehicle_id in planned:
+                if vehicle_id in new_routes and vehicle_id not in still_using:
+                    self.detoured.setdefault(road_id, set()).add(vehicle_id)
+
+        return new_routes
@@ -1,4 +1,5 @@
 import heapq
+from itertools import islice
 import networkx as nx
 
 def find_shortest_path(city_graph, start_node, end_node, traffic_data):
@@ -81,11 +82,9 @@ def find_alternative_routes(city_graph, start_node, end_node, traffic_data, k=3)
         graph[source][target]['weight'] = new_weight
     
     try:
-        # Use NetworkX's k shortest paths algorithm
-        routes = list(nx.shortest_simple_paths(graph, start_node, end_node, weight='weight'))
-        
-        # Limit to k routes
-        routes = routes[:k]
+        # Use NetworkX's k shortest paths algorithm, taking only the first k
+        # routes from the generator instead of enumerating every simple path
+        routes = list(islice(nx.shortest_simple_paths(graph, start_node, end_node, weight='weight'), k))
         
         # Format the results
         result = []
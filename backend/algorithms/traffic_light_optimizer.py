@@ -1,3 +1,80 @@
+def intersection_demand(city_graph, intersection, traffic_data):
+    """
+    Sum the traffic density of the roads entering an intersection, split by
+    north-south and east-west approach.
+    
+    Returns:
+        Tuple of (north_south_density, east_west_density)
+    """
+    north_south_density = 0
+    east_west_density = 0
+    
+    for source, target, data in city_graph.graph.in_edges(intersection, data=True):
+        density = traffic_data.get(data['road_id'], 0)
+        
+        # Determine if the road is north-south or east-west based on node IDs
+        # Assuming node IDs are in the format "intersection_i_j"
+        source_parts = source.split('_')
+        intersection_parts = intersection.split('_')
+        
+        if len(source_parts) >= 3 and len(intersection_parts) >= 3:
+            source_i, source_j = int(source_parts[1]), int(source_parts[2])
+            intersection_i, intersection_j = int(intersection_parts[1]), int(intersection_parts[2])
+            
+            if source_i == intersection_i:  # Same column, so north-south direction
+                north_south_density += density
+            elif source_j == intersection_j:  # Same row, so east-west direction
+                east_west_density += density
+    
+    return north_south_density, east_west_density
+
+def check_green_limits(min_green, max_green, cycle_time):
+    """Raise ValueError unless a cycle can be split with both directions within the limits"""
+    if min_green < 0 or min_green > max_green:
+        raise ValueError("min_green must be between 0 and max_green")
+    if 2 * min_green > cycle_time or 2 * max_green < cycle_time:
+        raise ValueError("cycle_time must be between 2 * min_green and 2 * max_green")
+
+def green_split(north_south_density, east_west_density, min_green=15, max_green=60, cycle_time=60):
+    """
+    Split a signal cycle between the two directions in proportion to their
+    demand, within the minimum and maximum green times.
+    
+    Returns:
+        Tuple of (north_south_green_time, east_west_green_time)
+    """
+    check_green_limits(min_green, max_green, cycle_time)
+    
+    total_density = north_south_density + east_west_density
+    
+    if total_density <= 0:
+        # Default to equal distribution if no traffic data
+        return cycle_time // 2, cycle_time - cycle_time // 2
+    
+    ns_ratio = north_south_density / total_density
+    ew_ratio = east_west_density / total_density
+    
+    # Allocate time proportionally with minimum and maximum constraints
+    ns_green_time = max(min_green, min(max_green, int(cycle_time * ns_ratio)))
+    ew_green_time = max(min_green, min(max_green, int(cycle_time * ew_ratio)))
+    
+    # Ensure the total cycle time is maintained
+    if ns_green_time + ew_green_time != cycle_time:
+        # Adjust the larger one to maintain the cycle time
+        if ns_green_time > ew_green_time:
+            ns_green_time = cycle_time - ew_green_time
+        else:
+            ew_green_time = cycle_time - ns_green_time
+    
+    # The adjustment can push a direction past its limits; keep north-south
+    # within the range that also leaves east-west within them
+    ns_low = max(min_green, cycle_time - max_green)
+    ns_high = min(max_green, cycle_time - min_green)
+    ns_green_time = max(ns_low, min(ns_high, ns_green_time))
+    ew_green_time = cycle_time - ns_green_time
+    
+    return ns_green_time, ew_green_time
+
 def optimize_traffic_lights(city_graph, traffic_data):
     """
     Optimize traffic light timings based on current traffic conditions.
@@ -16,57 +93,12 @@ def optimize_traffic_lights(city_graph, traffic_data):
     traffic_lights = city_graph.get_traffic_lights()
     
     for intersection, light in traffic_lights.items():
-        # Get incoming roads to this intersection
-        incoming_roads = []
-        for source, target, data in city_graph.graph.in_edges(intersection, data=True):
-            incoming_roads.append((source, data['road_id']))
-        
         # Calculate traffic density for north-south and east-west directions
-        north_south_density = 0
-        east_west_density = 0
-        
-        for source, road_id in incoming_roads:
-            density = traffic_data.get(road_id, 0)
-            
-            # Determine if the road is north-south or east-west based on node IDs
-            # Assuming node IDs are in the format "intersection_i_j"
-            source_parts = source.split('_')
-            intersection_parts = intersection.split('_')
-            
-            if len(source_parts) >= 3 and len(intersection_parts) >= 3:
-                source_i, source_j = int(source_parts[1]), int(source_parts[2])
-                intersection_i, intersection_j = int(intersection_parts[1]), int(intersection_parts[2])
-                
-                if source_i == intersection_i:  # Same column, so north-south direction
-                    north_south_density += density
-                elif source_j == intersection_j:  # Same row, so east-west direction
-                    east_west_density += density
+        north_south_density, east_west_density = intersection_demand(city_graph, intersection, traffic_data)
         
         # Calculate optimal green times based on traffic density ratio
         # Minimum green time is 15 seconds, maximum is 60 seconds
-        total_density = north_south_density + east_west_density
-        
-        if total_density > 0:
-            ns_ratio = north_south_density / total_density
-            ew_ratio = east_west_density / total_density
-            
-            # Allocate time proportionally with minimum and maximum constraints
-            cycle_time = 60  # Total cycle time in seconds
-            
-            ns_green_time = max(15, min(60, int(cycle_time * ns_ratio)))
-            ew_green_time = max(15, min(60, int(cycle_time * ew_ratio)))
-            
-            # Ensure the total cycle time is maintained
-            if ns_green_time + ew_green_time != cycle_time:
-                # Adjust the larger one to maintain the cycle time
-                if ns_green_time > ew_green_time:
-                    ns_green_time = cycle_time - ew_green_time
-                else:
-                    ew_green_time = cycle_time - ns_green_time
-        else:
-            # Default to equal distribution if no traffic data
-            ns_green_time = 30
-            ew_green_time = 30
+        ns_green_time, ew_green_time = green_split(north_south_density, east_west_density)
         
         optimized_timings[intersection] = {
             "north_south": ns_green_time,
@@ -1,5 +1,37 @@
+import networkx as nx
+
 from .shortest_path import find_shortest_path, find_alternative_routes
 
+# Vehicles sharing a destination before a batch reroute switches from
+# per-vehicle searches to one shortest-path tree rooted at the destination
+MIN_SHARED_DESTINATION_BATCH = 4
+
+def incident_adjustments(city_graph, traffic_data, incidents):
+    """
+    Return adjusted traffic density for the roads leaving incident locations.
+    Only the affected roads are included, so callers can overlay the result
+    on traffic_data without copying it.
+    """
+    adjusted = {}
+    
+    for incident in incidents:
+        location = incident.get('location')
+        severity = incident.get('severity', 1.0)  # Default severity factor
+        
+        # Find all roads connected to the incident location
+        for source, target, data in city_graph.graph.edges(location, data=True):
+            road_id = data['road_id']
+            
+            # Increase traffic density for affected roads
+            if road_id in adjusted:
+                adjusted[road_id] *= (1 + severity)
+            elif road_id in traffic_data:
+                adjusted[road_id] = traffic_data[road_id] * (1 + severity)
+            else:
+                adjusted[road_id] = 50 * severity  # Default high traffic
+    
+    return adjusted
+
 def suggest_routes(city_graph, vehicles, traffic_data, incidents):
     """
     Suggest optimal routes for vehicles based on current traffic conditions.
@@ -18,21 +50,7 @@ def suggest_routes(city_graph, vehicles, traffic_data, incidents):
     
     # Create a copy of traffic data to account for incidents
     adjusted_traffic_data = traffic_data.copy()
-    
-    # Adjust traffic data based on incidents
-    for incident in incidents:
-        location = incident.get('location')
-        severity = incident.get('severity', 1.0)  # Default severity factor
-        
-        # Find all roads connected to the incident location
-        for source, target, data in city_graph.graph.edges(location, data=True):
-            road_id = data['road_id']
-            
-            # Increase traffic density for affected roads
-            if road_id in adjusted_traffic_data:
-                adjusted_traffic_data[road_id] *= (1 + severity)
-            else:
-                adjusted_traffic_data[road_id] = 50 * severity  # Default high traffic
+    adjusted_traffic_data.update(incident_adjustments(city_graph, traffic_data, incidents))
     
     # Process each vehicle
     for vehicle_id, vehicle_data in vehicles.items():
@@ -136,3 +154,58 @@ def optimize_multi_vehicle_routing(city_graph, vehicles, traffic_data):
             optimized_routes[vehicle_id] = route
     
     return optimized_routes
+
+def reroute_vehicles_batch(city_graph, vehicles, traffic_data, incidents):
+    """
+    Route a batch of vehicles at once on a single traffic-adjusted view of
+    the graph. Vehicles sharing a destination are served by one Dijkstra
+    search from that destination over the reversed graph.
+    
+    Args:
+        city_graph: CityGraph object
+        vehicles: Dictionary of vehicles with their current positions and destinations
+        traffic_data: Dictionary of current traffic density on each road
+        incidents: List of current traffic incidents
+        
+    Returns:
+        Dictionary of new routes for each vehicle, in the suggest_routes format
+    """
+    overrides = incident_adjustments(city_graph, traffic_data, incidents)
+    
+    def weight(source, target, data):
+        road_id = data['road_id']
+        density = overrides.get(road_id, traffic_data.get(road_id, 0))
+        return data['weight'] * (1 + density / 20)
+    
+    by_destination = {}
+    for vehicle_id, vehicle_data in vehicles.items():
+        current_position = vehicle_data.get('current_position')
+        destination = vehicle_data.get('destination')
+        if current_position and destination and current_position != destination:
+            by_destination.setdefault(destination, []).append((vehicle_id, current_position))
+    
+    graph = city_graph.graph
+    new_routes = {}
+    
+    for destination, group in by_destination.items():
+        if len(group) < MIN_SHARED_DESTINATION_BATCH:
+            # A few bidirectional searches explore far less than a full tree
+            for vehicle_id, current_position in group:
+                try:
+                    length, path = nx.bidirectional_dijkstra(graph, current_position, destination, weight=weight)
+                except (nx.NetworkXNoPath, nx.NodeNotFound):
+                    continue
+                new_routes[vehicle_id] = {'path': path, 'length': length, 'traffic_adjusted': True}
+            continue
+        
+        # Paths from every node to the destination, found in reverse
+        lengths, paths = nx.single_source_dijkstra(graph.reverse(copy=False), destination, weight=weight)
+        for vehicle_id, current_position in group:
+            if current_position in paths:
+                new_routes[vehicle_id] = {
+                    'path': paths[current_position][::-1],
+                    'length': lengths[current_position],
+                    'traffic_adjusted': True
+                }
+    
+    return new_routes
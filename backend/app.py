@@ -1,44 +1,156 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import json
+import math
+import os
 import time
 from models.city_graph import CityGraph
 from algorithms.shortest_path import find_shortest_path
 from algorithms.traffic_light_optimizer import optimize_traffic_lights
 from algorithms.vehicle_router import suggest_routes
+from algorithms.incident_rerouter import IncidentRerouter
+from algorithms.adaptive_signal_control import AdaptiveSignalController
 from simulation.traffic_simulator import TrafficSimulator
+from simulation.demand import DemandGenerator
+from simulation.ensemble import EnsembleJob
+from single_flight import SingleFlightCache
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Initialize city graph and simulator
-city_graph = CityGraph()
+# Initialize city graph and simulator. CITY_GRAPH_FILE may name a compiled
+# graph (memory-mapped, shared between worker processes) or a JSON city.
+# The simulator reads a compiled city's topology straight from its arrays;
+# the networkx graph is only built by the first request that needs it
+# (routing, light optimization, the city map). Startup still routes the
+# initial vehicles, which takes time proportional to the network size.
+city_graph_file = os.environ.get('CITY_GRAPH_FILE')
+city_graph = CityGraph.load(city_graph_file) if city_graph_file else CityGraph()
 simulator = TrafficSimulator(city_graph)
+simulator.set_incident_rerouter(IncidentRerouter())
+
+# Background what-if ensemble jobs by ID; only the most recent finished
+# jobs are kept for polling
+ensemble_jobs = {}
+MAX_FINISHED_ENSEMBLE_JOBS = 20
+
+# Shares optimizer/rerouter results between concurrent and repeated calls
+# made against the same simulation state
+expensive_results = SingleFlightCache()
+
+def _simulation_state_key():
+    return (simulator.time_step, simulator.state_version)
+
+# Below this zoom level map and traffic queries return per-tile aggregates
+DETAIL_ZOOM = 3
+
+def _parse_viewport():
+    """
+    Read the optional bbox=minX,minY,maxX,maxY and zoom query parameters.
+    Returns (bbox, zoom, error); bbox is None when the whole city is requested.
+    """
+    bbox_param = request.args.get('bbox')
+    zoom = request.args.get('zoom', type=int)
+    if not bbox_param:
+        return None, zoom, None
+    
+    try:
+        bbox = tuple(float(v) for v in bbox_param.split(','))
+    except ValueError:
+        return None, zoom, 'bbox must be four numbers: minX,minY,maxX,maxY'
+    if len(bbox) != 4 or not all(math.isfinite(v) for v in bbox) or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        return None, zoom, 'bbox must be four numbers: minX,minY,maxX,maxY'
+    
+    return bbox, zoom, None
 
 @app.route('/api/city-map', methods=['GET'])
 def get_city_map():
-    """Return the current city map with nodes and edges"""
+    """Return the current city map with nodes and edges, optionally limited to a viewport"""
+    bbox, zoom, error = _parse_viewport()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if bbox is None:
+        return jsonify({
+            'nodes': city_graph.get_nodes(),
+            'edges': city_graph.get_edges(),
+            'trafficLights': city_graph.get_traffic_lights()
+        })
+    
+    index = city_graph.get_spatial_index()
+    
+    if zoom is not None and zoom < DETAIL_ZOOM:
+        # Summarize roads per tile instead of sending every element
+        edges = index.query_edges(bbox)
+        capacities = {road_id: city_graph.graph[s][t]['capacity'] for s, t, road_id in edges}
+        return jsonify({
+            'nodes': [],
+            'edges': [],
+            'trafficLights': {},
+            'tiles': index.aggregate_by_tile(capacities, capacities, index.tile_size_for_zoom(zoom))
+        })
+    
+    nodes = city_graph.get_nodes(bbox)
+    lights = city_graph.get_traffic_lights()
     return jsonify({
-        'nodes': city_graph.get_nodes(),
-        'edges': city_graph.get_edges(),
-        'trafficLights': city_graph.get_traffic_lights()
+        'nodes': nodes,
+        'edges': city_graph.get_edges(bbox),
+        'trafficLights': {node['id']: lights[node['id']] for node in nodes if node['id'] in lights}
     })
 
 @app.route('/api/traffic-data', methods=['GET'])
 def get_traffic_data():
-    """Return current traffic data from simulation"""
+    """
+    Return current traffic data from simulation, optionally limited to a
+    viewport. completedTrips counts vehicles that arrived (they leave the
+    vehicle list when they do).
+    """
+    bbox, zoom, error = _parse_viewport()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if bbox is None:
+        return jsonify({
+            'vehiclePositions': simulator.get_vehicle_positions(),
+            'trafficDensity': simulator.get_traffic_density(),
+            'incidents': simulator.get_incidents(),
+            'completedTrips': simulator.trip_log.count
+        })
+    
+    index = city_graph.get_spatial_index()
+    road_ids = [road_id for _, _, road_id in index.query_edges(bbox)]
+    visible_roads = set(road_ids)
+    visible_nodes = index.query_nodes(bbox)
+    density = simulator.get_traffic_density()
+    incidents = [i for i in simulator.get_incidents() if i['road_id'] in visible_roads]
+    
+    if zoom is not None and zoom < DETAIL_ZOOM:
+        return jsonify({
+            'vehiclePositions': {},
+            'vehicleCount': simulator.count_vehicles_at(visible_nodes),
+            'trafficDensity': {},
+            'densityTiles': index.aggregate_by_tile(road_ids, density, index.tile_size_for_zoom(zoom)),
+            'incidents': incidents,
+            'completedTrips': simulator.trip_log.count
+        })
+    
     return jsonify({
-        'vehiclePositions': simulator.get_vehicle_positions(),
-        'trafficDensity': simulator.get_traffic_density(),
-        'incidents': simulator.get_incidents()
+        'vehiclePositions': simulator.get_vehicle_positions(visible_nodes),
+        'trafficDensity': {road_id: density.get(road_id, 0) for road_id in road_ids},
+        'incidents': incidents,
+        'completedTrips': simulator.trip_log.count
     })
 
 @app.route('/api/optimize-lights', methods=['POST'])
 def optimize_lights():
     """Optimize traffic light timings based on current traffic"""
-    traffic_data = simulator.get_traffic_density()
-    new_timings = optimize_traffic_lights(city_graph, traffic_data)
-    city_graph.update_traffic_light_timings(new_timings)
+    def compute():
+        traffic_data = simulator.get_traffic_density()
+        new_timings = optimize_traffic_lights(city_graph, traffic_data)
+        city_graph.update_traffic_light_timings(new_timings)
+        return new_timings
+    
+    new_timings = expensive_results.run('optimize-lights', _simulation_state_key(), compute)
     return jsonify({'success': True, 'newTimings': new_timings})
 
 @app.route('/api/route', methods=['POST'])
@@ -59,23 +171,68 @@ def calculate_route():
 @app.route('/api/reroute-vehicles', methods=['POST'])
 def reroute_vehicles():
     """Reroute vehicles based on current traffic conditions"""
-    vehicles = simulator.get_vehicle_positions()
-    traffic_data = simulator.get_traffic_density()
-    incidents = simulator.get_incidents()
-    
-    new_routes = suggest_routes(city_graph, vehicles, traffic_data, incidents)
-    simulator.update_vehicle_routes(new_routes)
+    def compute():
+        vehicles = simulator.get_vehicle_positions()
+        traffic_data = simulator.get_traffic_density()
+        incidents = simulator.get_incidents()
+        
+        new_routes = suggest_routes(city_graph, vehicles, traffic_data, incidents)
+        simulator.update_vehicle_routes(new_routes)
+        return new_routes
     
+    # Applying the routes bumps the state version, so the result is cached
+    # under the state it leaves behind
+    new_routes = expensive_results.run(
+        'reroute-vehicles', _simulation_state_key(), compute, key_after=_simulation_state_key
+    )
+    return jsonify({'success': True, 'newRoutes': new_routes})
+
+@app.route('/api/incident-reroute', methods=['POST'])
+def incident_reroute():
+    """Reroute only the vehicles affected by incidents added or expired since the last call"""
+    new_routes = simulator.incident_rerouter.process(simulator)
     return jsonify({'success': True, 'newRoutes': new_routes})
 
+@app.route('/api/auto-reroute', methods=['POST'])
+def auto_reroute():
+    """Enable or disable incident-driven rerouting after every simulation step"""
+    data = request.json or {}
+    simulator.incident_rerouter.auto = bool(data.get('enabled', True))
+    return jsonify({'success': True, 'enabled': simulator.incident_rerouter.auto})
+
+@app.route('/api/adaptive-signals', methods=['POST'])
+def adaptive_signals():
+    """Enable or disable per-step adaptive signal control"""
+    data = request.json or {}
+    
+    if not data.get('enabled', True):
+        simulator.set_signal_controller(None)
+        return jsonify({'success': True, 'enabled': False})
+    
+    try:
+        controller = AdaptiveSignalController(
+            city_graph,
+            threshold=float(data.get('threshold', 0.1)),
+            min_green=int(data.get('minGreen', 15)),
+            max_green=int(data.get('maxGreen', 60)),
+            cycle_time=int(data.get('cycleTime', 60))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    simulator.set_signal_controller(controller)
+    return jsonify({'success': True, 'enabled': True})
+
 @app.route('/api/simulate', methods=['POST'])
 def run_simulation():
-    """Run simulation for a specified number of steps"""
+    """
+    Run simulation for a specified number of steps. With mode 'event', idle
+    stretches are skipped by jumping between events.
+    """
     data = request.json
     steps = data.get('steps', 1)
     
-    for _ in range(steps):
-        simulator.step()
+    simulator.advance(steps, event_driven=data.get('mode') == 'event')
     
     return jsonify({'success': True})
 
@@ -83,6 +240,7 @@ def run_simulation():
 def reset_simulation():
     """Reset the simulation to initial state"""
     simulator.reset()
+    expensive_results.invalidate()
     return jsonify({'success': True})
 
 @app.route('/api/add-incident', methods=['POST'])
@@ -93,8 +251,97 @@ def add_incident():
     incident_type = data.get('type', 'accident')
     duration = data.get('duration', 10)
     
-    simulator.add_incident(location, incident_type, duration)
+    simulator.add_incident(
+        location, incident_type, duration,
+        road_id=data.get('roadId'),
+        severity=data.get('severity')
+    )
+    return jsonify({'success': True})
+
+@app.route('/api/demand', methods=['POST'])
+def configure_demand():
+    """Configure continuous vehicle demand (OD rates and time-of-day profile)"""
+    data = request.json or {}
+    
+    if not data.get('enabled', True):
+        simulator.set_demand(None)
+        return jsonify({'success': True})
+    
+    try:
+        demand = DemandGenerator.from_config(city_graph, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    simulator.set_demand(demand)
     return jsonify({'success': True})
 
+@app.route('/api/trip-stats', methods=['GET'])
+def get_trip_stats():
+    """Return travel-time statistics of completed trips"""
+    return jsonify(simulator.get_trip_statistics())
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Return hit/coalesce/miss counts of the single-flight endpoints"""
+    return jsonify(expensive_results.get_stats())
+
+def _int_param(data, key, default):
+    """Read an integer (or integer string) from a JSON body, raising ValueError otherwise"""
+    value = data.get(key, default)
+    if value is None or (isinstance(value, int) and not isinstance(value, bool)):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"{key} must be an integer")
+
+def _prune_ensemble_jobs():
+    """Forget the oldest finished jobs beyond MAX_FINISHED_ENSEMBLE_JOBS"""
+    finished = sorted(
+        (job for job in ensemble_jobs.values() if job.finished),
+        key=lambda job: job.finished_at
+    )
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_ENSEMBLE_JOBS)]:
+        del ensemble_jobs[job.id]
+
+@app.route('/api/ensemble', methods=['POST'])
+def start_ensemble():
+    """Start a Monte Carlo ensemble forked from the current simulation state"""
+    data = request.json or {}
+    
+    try:
+        job = EnsembleJob(
+            simulator,
+            _int_param(data, 'runs', 10),
+            _int_param(data, 'steps', 100),
+            seed=_int_param(data, 'seed', 0),
+            variations=data.get('variations'),
+            max_workers=_int_param(data, 'workers', None)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    _prune_ensemble_jobs()
+    ensemble_jobs[job.id] = job.start()
+    return jsonify({'success': True, 'jobId': job.id})
+
+@app.route('/api/ensemble/<job_id>', methods=['GET'])
+def get_ensemble(job_id):
+    """Return progress and aggregated statistics of an ensemble job"""
+    job = ensemble_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown ensemble job'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/ensemble/<job_id>/cancel', methods=['POST'])
+def cancel_ensemble(job_id):
+    """Cancel a running ensemble job"""
+    job = ensemble_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown ensemble job'}), 404
+    return jsonify({'success': job.cancel()})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,229 @@
+"""
+Headless batch simulation.
+
+Runs TrafficSimulator for a number of steps without the web stack and writes
+sampled metrics and state as columns of a compressed NumPy (.npz) archive.
+
+Example:
+    python batch_simulate.py --grid 20 --steps 5000 --seed 1 \\
+        --scenario scenario.json --optimize-every 60 --reroute-every 120 \\
+        --sample-every 10 --output run.npz
+
+With --engine ctm the mesoscopic cell transmission engine is used instead
+of per-vehicle simulation; rerouting is skipped since it has no vehicles.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from models.city_graph import CityGraph
+from algorithms.traffic_light_optimizer import optimize_traffic_lights
+from algorithms.vehicle_router import suggest_routes
+from algorithms.incident_rerouter import IncidentRerouter
+from algorithms.adaptive_signal_control import AdaptiveSignalController
+from simulation.traffic_simulator import TrafficSimulator
+from simulation.cell_transmission import CellTransmissionSimulator
+from simulation.demand import DemandGenerator
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a traffic simulation without the web server")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--grid", type=int, default=5, help="Size of a square grid city (default 5)")
+    source.add_argument("--graph-file", help="City saved as a compiled graph or as JSON")
+    parser.add_argument("--engine", choices=["vehicle", "ctm"], default="vehicle",
+                        help="Per-vehicle simulator or mesoscopic cell transmission engine")
+    parser.add_argument("--steps", type=int, default=1000, help="Number of time steps to simulate")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--scenario", help="Scenario config JSON (vehicles, demand, incidents, signalTimings)")
+    parser.add_argument("--optimize-every", type=int, default=0, help="Optimize traffic lights every N steps (0 = never)")
+    parser.add_argument("--reroute-every", type=int, default=0, help="Reroute vehicles every N steps (0 = never)")
+    parser.add_argument("--event-driven", action="store_true",
+                        help="Skip idle steps by jumping between events (vehicle engine only)")
+    parser.add_argument("--incident-reroute", action="store_true",
+                        help="Reroute vehicles affected by incidents after every step")
+    parser.add_argument("--adaptive-signals", type=float, default=None, metavar="THRESHOLD",
+                        help="Re-optimize lights inside every step when an intersection's demand share moves by THRESHOLD")
+    parser.add_argument("--sample-every", type=int, default=10, help="Record metrics every N steps")
+    parser.add_argument("--output", default="simulation.npz", help="Output .npz file")
+    parser.add_argument("--save-graph", help="Also write the city as a compiled graph file")
+    parser.add_argument("--quiet", action="store_true", help="Do not print a summary")
+    return parser.parse_args(argv)
+
+def load_scenario(path):
+    """Load a scenario config, or return an empty one"""
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def build_city(args):
+    """Build the CityGraph selected on the command line"""
+    if args.graph_file:
+        return CityGraph.load(args.graph_file)
+    return CityGraph(grid_size=args.grid)
+
+def update_timings(simulator, new_timings):
+    """Apply light timings through the engine so its own light state stays in sync"""
+    if isinstance(simulator, CellTransmissionSimulator):
+        simulator.update_traffic_light_timings(new_timings)
+    else:
+        simulator.city_graph.update_traffic_light_timings(new_timings)
+
+def run(args):
+    """Run the batch simulation and return the sampled columns"""
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    scenario = load_scenario(args.scenario)
+    city_graph = build_city(args)
+    if args.save_graph:
+        city_graph.save_compiled(args.save_graph)
+    mesoscopic = args.engine == "ctm"
+
+    if mesoscopic:
+        simulator = CellTransmissionSimulator(
+            city_graph,
+            inflow_rate=scenario.get("inflowRate", 1.0),
+            exit_fraction=scenario.get("exitFraction", 0.2),
+            seed=args.seed
+        )
+        road_ids = simulator.road_ids
+        light_ids = simulator.light_ids
+    else:
+        simulator = TrafficSimulator(city_graph, num_vehicles=scenario.get("vehicles", 50))
+        if scenario.get("demand"):
+            simulator.set_demand(DemandGenerator.from_config(city_graph, scenario["demand"]))
+        if args.incident_reroute:
+            simulator.set_incident_rerouter(IncidentRerouter(auto=True))
+        if args.adaptive_signals is not None:
+            simulator.set_signal_controller(AdaptiveSignalController(city_graph, threshold=args.adaptive_signals))
+        road_ids = sorted(simulator.get_traffic_density().keys())
+        light_ids = sorted(city_graph.traffic_lights.keys())
+
+    if scenario.get("signalTimings"):
+        update_timings(simulator, scenario["signalTimings"])
+
+    # Scheduled incidents by time step
+    incidents_by_step = {}
+    for incident in scenario.get("incidents", []):
+        incidents_by_step.setdefault(incident.get("step", 0), []).append(incident)
+
+    columns = {
+        "time_step": [],
+        "active_vehicles": [],
+        "completed_trips": [],
+        "mean_travel_time": [],
+        "incidents": [],
+        "mean_density": [],
+    }
+    density_samples = []
+    light_samples = []
+
+    def sample():
+        if mesoscopic:
+            density_row = simulator.get_density_array().astype(np.float32)
+            light_row = simulator.ns_state.copy()
+            totals = simulator.get_network_totals()
+            active, completed, mean_travel_time = totals["vehicles_in_network"], totals["exited"], 0.0
+        else:
+            density = simulator.traffic_density
+            density_row = np.fromiter((density.get(r, 0) for r in road_ids), np.float32, len(road_ids))
+            lights = city_graph.traffic_lights
+            light_row = np.fromiter(
+                (lights[l]["north_south"]["current_state"] == "green" for l in light_ids), np.int8, len(light_ids)
+            )
+            active = len(simulator.vehicles)
+            completed = simulator.trip_log.count
+            mean_travel_time = simulator.trip_log.mean()
+
+        columns["time_step"].append(simulator.time_step)
+        columns["active_vehicles"].append(active)
+        columns["completed_trips"].append(completed)
+        columns["mean_travel_time"].append(mean_travel_time)
+        columns["incidents"].append(len(simulator.incidents))
+        columns["mean_density"].append(float(density_row.mean()) if len(road_ids) else 0.0)
+        density_samples.append(density_row)
+        light_samples.append(light_row)
+
+    start = time.perf_counter()
+    sample()
+
+    schedules = [n for n in (args.optimize_every, args.reroute_every, args.sample_every) if n]
+    end = simulator.time_step + args.steps
+
+    def next_stop(t):
+        """Next step after t at which the loop has to intervene"""
+        stop = end
+        for every in schedules:
+            stop = min(stop, (t // every + 1) * every)
+        for step in incidents_by_step:
+            if step > t:
+                stop = min(stop, step)
+        return stop
+
+    while simulator.time_step < end:
+        for incident in incidents_by_step.get(simulator.time_step, []):
+            simulator.add_incident(
+                incident["location"],
+                incident.get("type", "accident"),
+                incident.get("duration", 10),
+                road_id=incident.get("roadId"),
+                severity=incident.get("severity")
+            )
+
+        if mesoscopic:
+            simulator.step()
+        else:
+            # Run straight to the next scheduled action
+            simulator.advance(next_stop(simulator.time_step) - simulator.time_step, args.event_driven)
+        t = simulator.time_step
+
+        if args.optimize_every and t % args.optimize_every == 0:
+            new_timings = optimize_traffic_lights(city_graph, simulator.get_traffic_density())
+            update_timings(simulator, new_timings)
+
+        if args.reroute_every and not mesoscopic and t % args.reroute_every == 0:
+            new_routes = suggest_routes(
+                city_graph,
+                simulator.get_vehicle_positions(),
+                simulator.get_traffic_density(),
+                simulator.get_incidents()
+            )
+            simulator.update_vehicle_routes(new_routes)
+
+        if args.sample_every and t % args.sample_every == 0:
+            sample()
+
+    elapsed = time.perf_counter() - start
+
+    output = {name: np.asarray(values) for name, values in columns.items()}
+    output["density"] = np.vstack(density_samples)
+    output["light_ns_green"] = np.vstack(light_samples)
+    output["road_ids"] = np.asarray(road_ids)
+    output["light_ids"] = np.asarray(light_ids)
+    if mesoscopic:
+        # Leave the city's light dictionaries in the engine's final state
+        simulator.sync_traffic_lights()
+        output["network_totals"] = np.asarray(json.dumps(simulator.get_network_totals()))
+    else:
+        output["trip_histogram"] = np.asarray(simulator.trip_log.histogram)
+        output["trip_stats"] = np.asarray(json.dumps(simulator.get_trip_statistics()))
+    return output, elapsed
+
+def main(argv=None):
+    args = parse_args(argv)
+    output, elapsed = run(args)
+    np.savez_compressed(args.output, **output)
+
+    if not args.quiet:
+        rate = args.steps / elapsed if elapsed > 0 else float("inf")
+        print(f"Simulated {args.steps} steps in {elapsed:.2f}s ({rate:.0f} steps/s)")
+        print(f"Wrote {len(output['time_step'])} samples to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
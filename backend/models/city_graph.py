@@ -1,24 +1,139 @@
 import networkx as nx
+import numpy as np
 import random
 import json
 
+from .spatial_index import SpatialIndex
+from .compiled_graph import CompiledGraph, save_compiled, is_compiled_file
+
+def _advance_light(light, ticks):
+    """Closed-form equivalent of `ticks` calls of the step_traffic_lights() update"""
+    ns = light["north_south"]
+    ew = light["east_west"]
+    
+    # Tick of the first switch: north-south is checked first, and the
+    # east-west counter is compared before it is incremented
+    ns_switch = max(1, ns["green_time"] - ns["time_in_state"])
+    ew_switch = max(1, ew["green_time"] - ew["time_in_state"] + 1)
+    first = min(ns_switch, ew_switch)
+    
+    if ticks < first:
+        ns["time_in_state"] += ticks
+        ew["time_in_state"] += ticks
+        return
+    
+    if ns_switch <= ew_switch:
+        ns["current_state"] = "red" if ns["current_state"] == "green" else "green"
+        ew["current_state"] = "green" if ns["current_state"] == "red" else "red"
+    else:
+        ew["current_state"] = "red" if ew["current_state"] == "green" else "green"
+        ns["current_state"] = "green" if ew["current_state"] == "red" else "red"
+    
+    # From here both counters restart at zero and the states are
+    # opposite, so every later switch flips both after a fixed period
+    remaining = ticks - first
+    period = min(max(1, ns["green_time"]), ew["green_time"] + 1)
+    if (remaining // period) % 2:
+        ns["current_state"], ew["current_state"] = ew["current_state"], ns["current_state"]
+    
+    ns["time_in_state"] = remaining % period
+    ew["time_in_state"] = remaining % period
+
 class CityGraph:
     """
     Represents the city as a graph where intersections are nodes
     and roads are edges.
     """
-    def __init__(self, load_default=True):
-        self.graph = nx.DiGraph()
-        self.traffic_lights = {}
+    def __init__(self, load_default=True, grid_size=5):
+        self._graph = nx.DiGraph()
+        self._traffic_lights = {}
+        self._spatial_index = None
+        
+        # Memory-mapped network when loaded with load_compiled; the networkx
+        # graph and light dictionaries are then only built when first used
+        self._compiled = None
+        self._adjacency = None
         
         if load_default:
-            self._create_default_city()
+            self.create_grid(grid_size, grid_size)
+    
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = self._build_graph_from_compiled()
+        return self._graph
+    
+    @graph.setter
+    def graph(self, value):
+        self._graph = value
+        self._spatial_index = None
     
-    def _create_default_city(self):
-        """Create a default city grid layout"""
-        # Create a 5x5 grid of intersections
-        for i in range(5):
-            for j in range(5):
+    @property
+    def traffic_lights(self):
+        if self._traffic_lights is None:
+            self._traffic_lights = self._compiled.traffic_lights()
+        return self._traffic_lights
+    
+    @traffic_lights.setter
+    def traffic_lights(self, value):
+        self._traffic_lights = value
+    
+    @classmethod
+    def load_compiled(cls, path, mmap=True):
+        """Open a city written with save_compiled without building the networkx graph"""
+        city = cls(load_default=False)
+        city._compiled = CompiledGraph(path, mmap=mmap)
+        city._graph = None
+        city._traffic_lights = None
+        return city
+    
+    @classmethod
+    def load(cls, path):
+        """Load a city from a compiled graph file or a JSON file"""
+        if is_compiled_file(path):
+            return cls.load_compiled(path)
+        return cls.load_json(path)
+    
+    def save_compiled(self, path):
+        """Save the city in the compiled, memory-mappable format"""
+        save_compiled(self, path)
+    
+    def _build_graph_from_compiled(self):
+        """Build the networkx view of a compiled city"""
+        compiled = self._compiled
+        node_ids = compiled.node_ids()
+        road_ids = compiled.road_ids()
+        node_x = compiled["node_x"].tolist()
+        node_y = compiled["node_y"].tolist()
+        
+        graph = nx.DiGraph()
+        graph.add_nodes_from(
+            (node, {"pos": (x, y), "type": node_type})
+            for node, x, y, node_type in zip(node_ids, node_x, node_y, compiled.node_types())
+        )
+        graph.add_edges_from(
+            (node_ids[s], node_ids[t], {
+                "weight": weight,
+                "capacity": capacity,
+                "current_flow": flow,
+                "road_id": road_id
+            })
+            for s, t, weight, capacity, flow, road_id in zip(
+                compiled.edge_sources().tolist(),
+                compiled["indices"].tolist(),
+                compiled["edge_weight"].tolist(),
+                compiled["edge_capacity"].tolist(),
+                compiled["edge_current_flow"].tolist(),
+                road_ids
+            )
+        )
+        return graph
+    
+    def create_grid(self, width, height):
+        """Create a width x height grid of intersections connected by two-way roads"""
+        self._spatial_index = None
+        for i in range(width):
+            for j in range(height):
                 node_id = f"intersection_{i}_{j}"
                 self.graph.add_node(
                     node_id, 
@@ -42,12 +157,12 @@ class CityGraph:
                     }
         
         # Connect intersections with roads
-        for i in range(5):
-            for j in range(5):
+        for i in range(width):
+            for j in range(height):
                 current = f"intersection_{i}_{j}"
                 
                 # Connect to east neighbor
-                if i < 4:
+                if i < width - 1:
                     east = f"intersection_{i+1}_{j}"
                     self.graph.add_edge(
                         current, east, 
@@ -65,7 +180,7 @@ class CityGraph:
                     )
                 
                 # Connect to north neighbor
-                if j < 4:
+                if j < height - 1:
                     north = f"intersection_{i}_{j+1}"
                     self.graph.add_edge(
                         current, north, 
@@ -82,8 +197,159 @@ class CityGraph:
                         road_id=f"road_s_{i}_{j+1}"
                     )
     
-    def get_nodes(self):
-        """Return all nodes with their attributes"""
+    @classmethod
+    def from_dict(cls, data):
+        """Build a city from the nodes/edges/trafficLights format returned by /api/city-map"""
+        city = cls(load_default=False)
+        
+        for node in data["nodes"]:
+            city.graph.add_node(
+                node["id"],
+                pos=(node["x"], node["y"]),
+                type=node.get("type", "intersection")
+            )
+        
+        for edge in data["edges"]:
+            city.graph.add_edge(
+                edge["source"], edge["target"],
+                weight=edge.get("weight", 1),
+                capacity=edge.get("capacity", 100),
+                current_flow=edge.get("current_flow", 0),
+                road_id=edge["id"]
+            )
+        
+        city.traffic_lights = data.get("trafficLights", {})
+        return city
+    
+    @classmethod
+    def load_json(cls, path):
+        """Load a city saved with save_json"""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+    
+    def to_dict(self):
+        """Return the city in the /api/city-map format"""
+        return {
+            "nodes": self.get_nodes(),
+            "edges": self.get_edges(),
+            "trafficLights": self.get_traffic_lights()
+        }
+    
+    def save_json(self, path):
+        """Save the city as JSON"""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+    
+    def to_arrays(self):
+        """
+        Return the network as flat arrays for vectorized engines: node IDs and
+        coordinates, and per-edge source/target node indices, weight,
+        capacity and road ID. Edges are grouped by source node.
+        """
+        if self._graph is None:
+            # Straight from the memory-mapped file, without networkx
+            compiled = self._compiled
+            return {
+                "node_ids": compiled.node_ids(),
+                "node_x": compiled["node_x"],
+                "node_y": compiled["node_y"],
+                "edge_source": compiled.edge_sources(),
+                "edge_target": compiled["indices"],
+                "edge_weight": compiled["edge_weight"],
+                "edge_capacity": compiled["edge_capacity"],
+                "road_ids": compiled.road_ids()
+            }
+        
+        node_ids = list(self.graph.nodes)
+        node_index = {node: i for i, node in enumerate(node_ids)}
+        positions = [self.graph.nodes[node]["pos"] for node in node_ids]
+        edges = list(self.graph.edges(data=True))
+        num_edges = len(edges)
+        
+        return {
+            "node_ids": node_ids,
+            "node_x": np.fromiter((pos[0] for pos in positions), np.float64, len(node_ids)),
+            "node_y": np.fromiter((pos[1] for pos in positions), np.float64, len(node_ids)),
+            "edge_source": np.fromiter((node_index[s] for s, _, _ in edges), np.int64, num_edges),
+            "edge_target": np.fromiter((node_index[t] for _, t, _ in edges), np.int64, num_edges),
+            "edge_weight": np.fromiter((d["weight"] for _, _, d in edges), np.float64, num_edges),
+            "edge_capacity": np.fromiter((d["capacity"] for _, _, d in edges), np.float64, num_edges),
+            "road_ids": [d["road_id"] for _, _, d in edges]
+        }
+    
+    def _compiled_adjacency(self):
+        """Targets and road IDs of the roads leaving each node of a compiled city"""
+        if self._adjacency is None:
+            compiled = self._compiled
+            node_ids = compiled.node_ids()
+            indptr = compiled["indptr"].tolist()
+            targets = [node_ids[t] for t in compiled["indices"].tolist()]
+            road_ids = compiled.road_ids()
+            self._adjacency = (
+                {node: targets[indptr[i]:indptr[i + 1]] for i, node in enumerate(node_ids)},
+                {node: road_ids[indptr[i]:indptr[i + 1]] for i, node in enumerate(node_ids)}
+            )
+        return self._adjacency
+    
+    # The accessors below answer topology queries from the compiled arrays
+    # while the networkx graph has not been built, so a simulator over a
+    # compiled city never builds it
+    
+    def node_ids(self):
+        """All node IDs"""
+        if self._graph is None:
+            return self._compiled.node_ids()
+        return list(self._graph.nodes)
+    
+    def has_node(self, node):
+        if self._graph is None:
+            return node in self._compiled_adjacency()[0]
+        return node in self._graph
+    
+    def successors(self, node):
+        """Nodes reachable from node over one road"""
+        if self._graph is None:
+            return self._compiled_adjacency()[0][node]
+        return self._graph.successors(node)
+    
+    def out_roads(self, node):
+        """(target, road_id) of every road leaving node"""
+        if self._graph is None:
+            targets, road_ids = self._compiled_adjacency()
+            return list(zip(targets[node], road_ids[node]))
+        return [(target, data["road_id"]) for _, target, data in self._graph.out_edges(node, data=True)]
+    
+    def road_id(self, source, target):
+        """ID of the road from source to target, or None if there is none"""
+        if self._graph is None:
+            targets, road_ids = self._compiled_adjacency()
+            for road_target, road_id in zip(targets.get(source, ()), road_ids.get(source, ())):
+                if road_target == target:
+                    return road_id
+            return None
+        data = self._graph.get_edge_data(source, target)
+        return data["road_id"] if data else None
+    
+    def roads(self):
+        """(source, target, road_id) of every road, in edge order"""
+        if self._graph is None:
+            compiled = self._compiled
+            node_ids = compiled.node_ids()
+            return [
+                (node_ids[s], node_ids[t], road_id)
+                for s, t, road_id in zip(compiled.edge_sources().tolist(), compiled["indices"].tolist(), compiled.road_ids())
+            ]
+        return [(source, target, data["road_id"]) for source, target, data in self._graph.edges(data=True)]
+    
+    def get_spatial_index(self):
+        """Return the spatial index over nodes and roads, building it on first use"""
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self)
+        return self._spatial_index
+    
+    def get_nodes(self, bbox=None):
+        """Return all nodes with their attributes, or only those inside bbox"""
+        nodes = self.graph.nodes if bbox is None else self.get_spatial_index().query_nodes(bbox)
         return [
             {
                 "id": node,
@@ -91,11 +357,18 @@ class CityGraph:
                 "y": self.graph.nodes[node]["pos"][1],
                 "type": self.graph.nodes[node]["type"]
             }
-            for node in self.graph.nodes
+            for node in nodes
         ]
     
-    def get_edges(self):
-        """Return all edges with their attributes"""
+    def get_edges(self, bbox=None):
+        """Return all edges with their attributes, or only those overlapping bbox"""
+        if bbox is None:
+            edges = self.graph.edges(data=True)
+        else:
+            edges = (
+                (source, target, self.graph[source][target])
+                for source, target, _ in self.get_spatial_index().query_edges(bbox)
+            )
         return [
             {
                 "id": data["road_id"],
@@ -105,7 +378,7 @@ class CityGraph:
                 "capacity": data["capacity"],
                 "current_flow": data["current_flow"]
             }
-            for source, target, data in self.graph.edges(data=True)
+            for source, target, data in edges
         ]
     
     def get_traffic_lights(self):
@@ -147,3 +420,20 @@ class CityGraph:
                 light["north_south"]["time_in_state"] = 0
             else:
                 light["east_west"]["time_in_state"] += 1
+    
+    def advance_traffic_lights(self, ticks):
+        """
+        Advance every light by `ticks` time steps with the same result as
+        calling step_traffic_lights() that many times, but in time that does
+        not depend on `ticks`.
+        """
+        if ticks <= 0:
+            return
+        
+        for light in self.traffic_lights.values():
+            _advance_light(light, ticks)
+    
+    def advance_traffic_light(self, intersection, ticks):
+        """Advance a single light by `ticks` time steps (see advance_traffic_lights)"""
+        if ticks > 0:
+            _advance_light(self.traffic_lights[intersection], ticks)
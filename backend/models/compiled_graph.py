@@ -0,0 +1,209 @@
+import json
+
+import numpy as np
+
+MAGIC = b"CITYGRF1"
+ALIGNMENT = 64
+VERSION = 1
+
+def _encode_strings(strings):
+    """Encode a string table as one newline-separated UTF-8 blob plus offsets"""
+    encoded = []
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    position = 0
+    for i, value in enumerate(strings):
+        if "\n" in value:
+            raise ValueError(f"Identifier contains a newline: {value!r}")
+        data = value.encode("utf-8")
+        encoded.append(data)
+        position += len(data) + 1
+        offsets[i + 1] = position
+    blob = b"\n".join(encoded)
+    return np.frombuffer(blob, dtype=np.uint8), offsets
+
+def _decode_strings(blob, offsets):
+    """Decode a whole string table"""
+    if len(offsets) < 2:
+        return []
+    return bytes(blob).decode("utf-8").split("\n")
+
+def save_compiled(city_graph, path):
+    """
+    Write a CityGraph to a single binary file of aligned arrays: node
+    coordinates, CSR adjacency, edge attributes with a road_id string table,
+    and the traffic light configuration.
+    """
+    arrays = city_graph.to_arrays()
+    node_ids = arrays["node_ids"]
+    num_nodes = len(node_ids)
+
+    # Sort edges by source for the CSR layout
+    order = np.argsort(arrays["edge_source"], kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(arrays["edge_source"], minlength=num_nodes), out=indptr[1:])
+    road_ids = [arrays["road_ids"][e] for e in order]
+
+    graph = city_graph.graph
+    node_types = [graph.nodes[node].get("type", "intersection") for node in node_ids]
+    current_flow = np.fromiter(
+        (graph[node_ids[s]][node_ids[t]].get("current_flow", 0)
+         for s, t in zip(arrays["edge_source"][order], arrays["edge_target"][order])),
+        np.float64, len(order)
+    )
+
+    node_index = {node: i for i, node in enumerate(node_ids)}
+    lights = city_graph.traffic_lights
+    light_nodes = [node for node in lights if node in node_index]
+
+    def light_column(direction, key, convert):
+        return np.array([convert(lights[node][direction][key]) for node in light_nodes], dtype=np.int64)
+
+    is_green = lambda state: 1 if state == "green" else 0
+
+    node_id_blob, node_id_offsets = _encode_strings(node_ids)
+    node_type_blob, node_type_offsets = _encode_strings(node_types)
+    road_id_blob, road_id_offsets = _encode_strings(road_ids)
+
+    columns = {
+        "node_x": np.asarray(arrays["node_x"], dtype=np.float64),
+        "node_y": np.asarray(arrays["node_y"], dtype=np.float64),
+        "node_id_blob": node_id_blob,
+        "node_id_offsets": node_id_offsets,
+        "node_type_blob": node_type_blob,
+        "node_type_offsets": node_type_offsets,
+        "indptr": indptr,
+        "indices": np.asarray(arrays["edge_target"][order], dtype=np.int64),
+        "edge_weight": np.asarray(arrays["edge_weight"][order], dtype=np.float64),
+        "edge_capacity": np.asarray(arrays["edge_capacity"][order], dtype=np.float64),
+        "edge_current_flow": current_flow,
+        "road_id_blob": road_id_blob,
+        "road_id_offsets": road_id_offsets,
+        "light_node": np.array([node_index[node] for node in light_nodes], dtype=np.int64),
+        "light_ns_green_time": light_column("north_south", "green_time", int),
+        "light_ew_green_time": light_column("east_west", "green_time", int),
+        "light_ns_state": light_column("north_south", "current_state", is_green),
+        "light_ew_state": light_column("east_west", "current_state", is_green),
+        "light_ns_time_in_state": light_column("north_south", "time_in_state", int),
+        "light_ew_time_in_state": light_column("east_west", "time_in_state", int),
+    }
+
+    # Lay the arrays out after the header, each aligned for direct mapping
+    header = {"version": VERSION, "arrays": {}}
+    offset = 0
+    for name, array in columns.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, array in columns.items():
+            f.seek(data_start + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+
+def is_compiled_file(path):
+    """Whether path starts with the compiled graph magic bytes"""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+class CompiledGraph:
+    """
+    Read-only view of a compiled graph file. Arrays are memory-mapped, so
+    opening is near-instant and processes mapping the same file share one
+    page-cached copy.
+    """
+    def __init__(self, path, mmap=True):
+        self.path = path
+        self.mmap = mmap
+
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a compiled city graph")
+            header_length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_length).decode("utf-8"))
+
+        if header.get("version") != VERSION:
+            raise ValueError(f"Unsupported compiled graph version: {header.get('version')}")
+
+        data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+        self.arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape)) if shape else 1
+            if count == 0:
+                self.arrays[name] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                self.arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + spec["offset"], shape=shape)
+            else:
+                with open(path, "rb") as f:
+                    f.seek(data_start + spec["offset"])
+                    self.arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+
+        self._node_ids = None
+        self._road_ids = None
+
+    def __getstate__(self):
+        # Worker processes reopen the file and share its pages instead of
+        # receiving a pickled copy of every array
+        return {"path": self.path, "mmap": self.mmap}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["mmap"])
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    @property
+    def num_nodes(self):
+        return len(self.arrays["node_x"])
+
+    @property
+    def num_edges(self):
+        return len(self.arrays["indices"])
+
+    def node_ids(self):
+        """All node IDs, decoded on first use"""
+        if self._node_ids is None:
+            self._node_ids = _decode_strings(self.arrays["node_id_blob"], self.arrays["node_id_offsets"])
+        return self._node_ids
+
+    def node_types(self):
+        return _decode_strings(self.arrays["node_type_blob"], self.arrays["node_type_offsets"])
+
+    def road_ids(self):
+        """All road IDs in CSR edge order, decoded on first use"""
+        if self._road_ids is None:
+            self._road_ids = _decode_strings(self.arrays["road_id_blob"], self.arrays["road_id_offsets"])
+        return self._road_ids
+
+    def edge_sources(self):
+        """Source node index of every edge, expanded from the CSR row pointers"""
+        return np.repeat(np.arange(self.num_nodes), np.diff(self.arrays["indptr"]))
+
+    def traffic_lights(self):
+        """Build the traffic light dictionaries used by CityGraph"""
+        node_ids = self.node_ids()
+        a = self.arrays
+        state = lambda value: "green" if value else "red"
+        return {
+            node_ids[node]: {
+                "north_south": {
+                    "green_time": int(a["light_ns_green_time"][k]),
+                    "current_state": state(a["light_ns_state"][k]),
+                    "time_in_state": int(a["light_ns_time_in_state"][k])
+                },
+                "east_west": {
+                    "green_time": int(a["light_ew_green_time"][k]),
+                    "current_state": state(a["light_ew_state"][k]),
+                    "time_in_state": int(a["light_ew_time_in_state"][k])
+                }
+            }
+            for k, node in enumerate(a["light_node"].tolist())
+        }
@@ -0,0 +1,123 @@
+import math
+
+class SpatialIndex:
+    """
+    Uniform-grid spatial index over intersection positions and road segments.
+    Each grid cell lists the nodes inside it and the roads whose bounding box
+    overlaps it, so a bounding-box query only touches the cells it covers.
+    """
+    def __init__(self, city_graph, cell_size=None):
+        graph = city_graph.graph
+        self.positions = {node: data["pos"] for node, data in graph.nodes(data=True)}
+
+        if self.positions:
+            xs = [pos[0] for pos in self.positions.values()]
+            ys = [pos[1] for pos in self.positions.values()]
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            self.bounds = (0, 0, 0, 0)
+
+        if cell_size is None:
+            # Aim for a handful of intersections per cell
+            extent = max(self.bounds[2] - self.bounds[0], self.bounds[3] - self.bounds[1], 1)
+            cell_size = 2 * extent / max(1, math.sqrt(len(self.positions)))
+        self.cell_size = cell_size
+
+        self.node_cells = {}
+        for node, (x, y) in self.positions.items():
+            self.node_cells.setdefault(self._cell(x, y), []).append(node)
+
+        self.edge_cells = {}
+        self.edge_midpoints = {}
+        for source, target, data in graph.edges(data=True):
+            x1, y1 = self.positions[source]
+            x2, y2 = self.positions[target]
+            edge = (source, target, data["road_id"])
+            self.edge_midpoints[data["road_id"]] = ((x1 + x2) / 2, (y1 + y2) / 2)
+
+            cx1, cy1 = self._cell(min(x1, x2), min(y1, y2))
+            cx2, cy2 = self._cell(max(x1, x2), max(y1, y2))
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    self.edge_cells.setdefault((cx, cy), []).append(edge)
+
+    def _cell(self, x, y):
+        return (int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size)))
+
+    def _cells_in(self, bbox):
+        min_x, min_y, max_x, max_y = bbox
+        cx1, cy1 = self._cell(min_x, min_y)
+        cx2, cy2 = self._cell(max_x, max_y)
+
+        # Never walk more cells than the index actually holds
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self.node_cells) + len(self.edge_cells):
+            keys = set(self.node_cells) | set(self.edge_cells)
+            return [key for key in keys if cx1 <= key[0] <= cx2 and cy1 <= key[1] <= cy2]
+
+        return [(cx, cy) for cx in range(cx1, cx2 + 1) for cy in range(cy1, cy2 + 1)]
+
+    def query_nodes(self, bbox):
+        """Return IDs of intersections inside the bounding box (min_x, min_y, max_x, max_y)"""
+        min_x, min_y, max_x, max_y = bbox
+        result = []
+        for cell in self._cells_in(bbox):
+            for node in self.node_cells.get(cell, ()):
+                x, y = self.positions[node]
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    result.append(node)
+        return result
+
+    def query_edges(self, bbox):
+        """Return (source, target, road_id) of roads whose segment bounding box overlaps bbox"""
+        min_x, min_y, max_x, max_y = bbox
+        seen = set()
+        result = []
+        for cell in self._cells_in(bbox):
+            for edge in self.edge_cells.get(cell, ()):
+                if edge[2] in seen:
+                    continue
+                seen.add(edge[2])
+
+                x1, y1 = self.positions[edge[0]]
+                x2, y2 = self.positions[edge[1]]
+                if max(x1, x2) >= min_x and min(x1, x2) <= max_x and max(y1, y2) >= min_y and min(y1, y2) <= max_y:
+                    result.append(edge)
+        return result
+
+    def aggregate_by_tile(self, road_ids, values, tile_size):
+        """
+        Average per-road values over square tiles, binning each road by its
+        midpoint. Returns a list of tiles with their bounds, mean and count.
+        """
+        # Roads on the far boundary of the city fall into the last tile
+        last_x = max(0, math.ceil((self.bounds[2] - self.bounds[0]) / tile_size) - 1)
+        last_y = max(0, math.ceil((self.bounds[3] - self.bounds[1]) / tile_size) - 1)
+
+        tiles = {}
+        for road_id in road_ids:
+            x, y = self.edge_midpoints[road_id]
+            key = (
+                min(last_x, int(math.floor((x - self.bounds[0]) / tile_size))),
+                min(last_y, int(math.floor((y - self.bounds[1]) / tile_size)))
+            )
+            tile = tiles.get(key)
+            if tile is None:
+                tile = tiles[key] = [0.0, 0]
+            tile[0] += values.get(road_id, 0)
+            tile[1] += 1
+
+        return [
+            {
+                "x": self.bounds[0] + tx * tile_size,
+                "y": self.bounds[1] + ty * tile_size,
+                "size": tile_size,
+                "mean": total / count,
+                "count": count
+            }
+            for (tx, ty), (total, count) in tiles.items()
+        ]
+
+    def tile_size_for_zoom(self, zoom):
+        """Tile edge length at a zoom level; zoom 0 covers the whole city with one tile"""
+        extent = max(self.bounds[2] - self.bounds[0], self.bounds[3] - self.bounds[1], 1)
+        return extent / (2 ** max(0, zoom))
@@ -0,0 +1,339 @@
+import uuid
+
+import numpy as np
+
+# Light phase encoding in the state arrays
+GREEN = 1
+RED = 0
+
+class CellTransmissionSimulator:
+    """
+    Mesoscopic traffic engine based on the cell transmission model.
+    Each road is split into cells holding an aggregate number of vehicles and
+    all cells advance together as numpy arrays, so no individual vehicles are
+    tracked. Exposes the same density, incident and light interfaces as
+    TrafficSimulator so the routing and light optimizer code can run on it.
+
+    Model (free-flow speed one cell per step, triangular fundamental diagram):
+        jam occupancy per cell N = capacity / cells on the road
+        max flow per cell     Q = N * wave_ratio / (1 + wave_ratio)
+        sending   S = min(n, Q)
+        receiving R = min(Q, wave_ratio * (N - n))
+    At intersections a fraction of the arriving flow leaves the network and
+    the rest, plus new demand, is shared among the outgoing roads in
+    proportion to their free space.
+    """
+    def __init__(self, city_graph, cells_per_unit_weight=3, wave_ratio=0.5, exit_fraction=0.2,
+                 inflow_rate=1.0, incident_rate=0.05, initial_density=(0, 50), seed=None):
+        """
+        Args:
+            city_graph: CityGraph object
+            cells_per_unit_weight: Cells per unit of edge weight (at least one per road)
+            wave_ratio: Backward wave speed relative to free-flow speed
+            exit_fraction: Fraction of the flow reaching an intersection that
+                ends its trip there
+            inflow_rate: New vehicles per step entering at each intersection,
+                or a dict of node ID -> rate
+            incident_rate: Probability of a random incident per step
+            initial_density: Range (0-100) of the random initial road density
+            seed: Seed for the engine's random generator
+        """
+        self.city_graph = city_graph
+        self.cells_per_unit_weight = cells_per_unit_weight
+        self.wave_ratio = wave_ratio
+        self.exit_fraction = exit_fraction
+        self.inflow_rate = inflow_rate
+        self.incident_rate = incident_rate
+        self.initial_density = initial_density
+        self.rng = np.random.default_rng(seed)
+
+        # Kept for interface compatibility; this engine has no individual vehicles
+        self.vehicles = {}
+
+        self._build_network()
+        self._build_signals()
+        self.reset()
+
+    def _build_network(self):
+        arrays = self.city_graph.to_arrays()
+        self.node_ids = arrays["node_ids"]
+        self.node_index = {node: i for i, node in enumerate(self.node_ids)}
+        self.road_ids = arrays["road_ids"]
+        self.road_index = {road_id: e for e, road_id in enumerate(self.road_ids)}
+        self.edge_source = np.asarray(arrays["edge_source"], dtype=np.int64)
+        self.edge_target = np.asarray(arrays["edge_target"], dtype=np.int64)
+        num_nodes = len(self.node_ids)
+        num_edges = len(self.road_ids)
+
+        # Cells of each road are contiguous, from its first to its last cell
+        cells = np.maximum(1, np.rint(np.asarray(arrays["edge_weight"]) * self.cells_per_unit_weight)).astype(np.int64)
+        self.edge_cells = cells
+        self.edge_last = np.cumsum(cells) - 1
+        self.edge_first = self.edge_last - cells + 1
+        self.cell_edge = np.repeat(np.arange(num_edges), cells)
+        num_cells = int(cells.sum())
+
+        capacity = np.asarray(arrays["edge_capacity"], dtype=np.float64)
+        self.edge_jam = capacity
+        self.jam = (capacity / cells)[self.cell_edge]
+        self.max_flow = self.jam * self.wave_ratio / (1 + self.wave_ratio)
+
+        # Flows between consecutive cells of the same road
+        has_next = np.ones(num_cells, dtype=bool)
+        has_next[self.edge_last] = False
+        self.internal = np.nonzero(has_next)[0]
+
+        # Dead ends absorb all arriving traffic
+        out_degree = np.bincount(self.edge_source, minlength=num_nodes)
+        self.node_exit = np.where(out_degree > 0, self.exit_fraction, 1.0)
+
+        if isinstance(self.inflow_rate, dict):
+            self.node_inflow = np.zeros(num_nodes)
+            for node, rate in self.inflow_rate.items():
+                if node in self.node_index:
+                    self.node_inflow[self.node_index[node]] = rate
+        else:
+            self.node_inflow = np.where(out_degree > 0, float(self.inflow_rate), 0.0)
+
+        self.node_x = np.asarray(arrays["node_x"])
+        self.node_y = np.asarray(arrays["node_y"])
+
+    def _build_signals(self):
+        """Copy light phases into arrays and map each incoming road to its light"""
+        lights = self.city_graph.get_traffic_lights()
+        self.light_ids = list(lights.keys())
+        num_lights = len(self.light_ids)
+
+        self.ns_state = np.zeros(num_lights, dtype=np.int8)
+        self.ew_state = np.zeros(num_lights, dtype=np.int8)
+        self.ns_time = np.zeros(num_lights, dtype=np.int64)
+        self.ew_time = np.zeros(num_lights, dtype=np.int64)
+        self.ns_green = np.zeros(num_lights, dtype=np.int64)
+        self.ew_green = np.zeros(num_lights, dtype=np.int64)
+        for k, intersection in enumerate(self.light_ids):
+            self._load_light(k, lights[intersection])
+
+        node_light = np.full(len(self.node_ids), -1, dtype=np.int64)
+        for k, intersection in enumerate(self.light_ids):
+            if intersection in self.node_index:
+                node_light[self.node_index[intersection]] = k
+
+        # A road is north-south when both ends share an x coordinate
+        self.edge_light = node_light[self.edge_target]
+        self.edge_is_ns = self.node_x[self.edge_source] == self.node_x[self.edge_target]
+        self.lit_edges = np.nonzero(self.edge_light >= 0)[0]
+
+    def _load_light(self, k, light):
+        self.ns_state[k] = GREEN if light["north_south"]["current_state"] == "green" else RED
+        self.ew_state[k] = GREEN if light["east_west"]["current_state"] == "green" else RED
+        self.ns_time[k] = light["north_south"]["time_in_state"]
+        self.ew_time[k] = light["east_west"]["time_in_state"]
+        self.ns_green[k] = light["north_south"]["green_time"]
+        self.ew_green[k] = light["east_west"]["green_time"]
+
+    def reset(self):
+        """Reset the simulation to initial state"""
+        low, high = self.initial_density
+        edge_density = self.rng.uniform(low, high, len(self.road_ids)) / 100
+        self.occupancy = self.jam * edge_density[self.cell_edge]
+        self.source_queue = np.zeros(len(self.node_ids))
+        self.capacity_factor = np.ones(len(self.jam))
+        self.incidents = []
+        self.time_step = 0
+        self.total_exited = 0.0
+        self.total_entered = 0.0
+
+    def step(self):
+        """Advance simulation by one time step"""
+        self.time_step += 1
+
+        self._step_traffic_lights()
+        self._propagate()
+        self._update_incidents()
+
+        if self.rng.random() < self.incident_rate:
+            self._add_random_incident()
+
+    def _step_traffic_lights(self):
+        """Vectorized version of CityGraph.step_traffic_lights"""
+        self.ns_time += 1
+        switch_ns = self.ns_time >= self.ns_green
+        self.ns_state[switch_ns] ^= 1
+        self.ns_time[switch_ns] = 0
+        self.ew_state[switch_ns] = 1 - self.ns_state[switch_ns]
+        self.ew_time[switch_ns] = 0
+
+        rest = ~switch_ns
+        switch_ew = rest & (self.ew_time >= self.ew_green)
+        self.ew_state[switch_ew] ^= 1
+        self.ew_time[switch_ew] = 0
+        self.ns_state[switch_ew] = 1 - self.ew_state[switch_ew]
+        self.ns_time[switch_ew] = 0
+
+        self.ew_time[rest & ~switch_ew] += 1
+
+    def _propagate(self):
+        """Move traffic between cells and across intersections"""
+        n = self.occupancy
+        max_flow = self.max_flow * self.capacity_factor
+        sending = np.minimum(n, max_flow)
+        receiving = np.minimum(max_flow, self.wave_ratio * (self.jam - n))
+
+        # Within roads
+        internal = self.internal
+        internal_flow = np.minimum(sending[internal], receiving[internal + 1])
+
+        # Road ends are held back by red lights
+        road_sending = sending[self.edge_last]
+        lit = self.lit_edges
+        light = self.edge_light[lit]
+        green = np.where(self.edge_is_ns[lit], self.ns_state[light], self.ew_state[light])
+        road_sending[lit] *= green
+        road_receiving = receiving[self.edge_first]
+
+        num_nodes = len(self.node_ids)
+        node_demand = np.bincount(self.edge_target, road_sending, minlength=num_nodes)
+        node_supply = np.bincount(self.edge_source, road_receiving, minlength=num_nodes)
+
+        # Queue new demand at its origin and let it compete for the outgoing roads
+        self.source_queue += self.node_inflow
+        through_demand = (1 - self.node_exit) * node_demand + self.source_queue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            admit = np.where(through_demand > 0, np.minimum(1.0, node_supply / through_demand), 1.0)
+
+        road_outflow = road_sending * admit[self.edge_target]
+        arrived = np.bincount(self.edge_target, road_outflow, minlength=num_nodes)
+        entering_source = self.source_queue * admit
+        entering = (1 - self.node_exit) * arrived + entering_source
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.where(node_supply > 0, entering / node_supply, 0.0)
+        road_inflow = road_receiving * share[self.edge_source]
+
+        n[internal] -= internal_flow
+        n[internal + 1] += internal_flow
+        n[self.edge_last] -= road_outflow
+        n[self.edge_first] += road_inflow
+
+        self.source_queue -= entering_source
+        self.total_entered += float(entering_source.sum())
+        self.total_exited += float((self.node_exit * arrived).sum())
+
+    def get_density_array(self):
+        """Density (0-100) of every road, in road_ids order"""
+        occupancy = np.add.reduceat(self.occupancy, self.edge_first) if len(self.occupancy) else self.occupancy
+        return 100 * occupancy / self.edge_jam
+
+    def get_traffic_density(self):
+        """Return current traffic density on all roads"""
+        return dict(zip(self.road_ids, self.get_density_array().tolist()))
+
+    def get_vehicle_positions(self, nodes=None):
+        """No individual vehicles are simulated"""
+        return {}
+
+    def get_incidents(self):
+        """Return current traffic incidents"""
+        return self.incidents
+
+    def get_network_totals(self):
+        """Return aggregate vehicle counts"""
+        return {
+            'vehicles_in_network': float(self.occupancy.sum()),
+            'queued_at_origin': float(self.source_queue.sum()),
+            'entered': self.total_entered,
+            'exited': self.total_exited
+        }
+
+    def _apply_capacity_factor(self, edge):
+        """Recompute the capacity reduction of a road from its active incidents"""
+        factor = 1.0
+        road_id = self.road_ids[edge]
+        for incident in self.incidents:
+            if incident['road_id'] == road_id:
+                factor *= 1 - incident['severity']
+        self.capacity_factor[self.edge_first[edge]:self.edge_last[edge] + 1] = factor
+
+    def _update_incidents(self):
+        """Update and remove expired incidents"""
+        updated_incidents = []
+        expired_edges = []
+
+        for incident in self.incidents:
+            incident['duration'] -= 1
+
+            if incident['duration'] > 0:
+                updated_incidents.append(incident)
+            else:
+                expired_edges.append(self.road_index[incident['road_id']])
+
+        self.incidents = updated_incidents
+        for edge in expired_edges:
+            self._apply_capacity_factor(edge)
+
+    def _create_incident(self, edge, incident_type, severity, duration):
+        incident = {
+            'id': str(uuid.uuid4()),
+            'road_id': self.road_ids[edge],
+            'location': self.node_ids[self.edge_source[edge]],
+            'type': incident_type,
+            'severity': severity,
+            'duration': duration
+        }
+        self.incidents.append(incident)
+        self._apply_capacity_factor(edge)
+        return incident
+
+    def _add_random_incident(self):
+        """Add a random traffic incident"""
+        if not self.road_ids:
+            return
+
+        edge = int(self.rng.integers(len(self.road_ids)))
+        self._create_incident(
+            edge,
+            str(self.rng.choice(['accident', 'construction', 'weather'])),
+            float(self.rng.uniform(0.3, 0.9)),
+            int(self.rng.integers(5, 21))
+        )
+
+    def add_incident(self, location, incident_type='accident', duration=10, road_id=None, severity=None):
+        """Add a traffic incident on a road leaving location (random unless road_id is given)"""
+        if location not in self.node_index:
+            return False
+
+        source = self.node_index[location]
+        if road_id is not None:
+            edge = self.road_index.get(road_id)
+            if edge is None or self.edge_source[edge] != source:
+                return False
+        else:
+            candidates = np.nonzero(self.edge_source == source)[0]
+            if not len(candidates):
+                return False
+            edge = int(self.rng.choice(candidates))
+
+        if severity is None:
+            severity = float(self.rng.uniform(0.5, 0.9))
+        self._create_incident(edge, incident_type, float(severity), duration)
+        return True
+
+    def update_traffic_light_timings(self, new_timings):
+        """Apply new green times to the city graph and the engine's light arrays"""
+        self.city_graph.update_traffic_light_timings(new_timings)
+        light_index = {intersection: k for k, intersection in enumerate(self.light_ids)}
+        for intersection, timing in new_timings.items():
+            k = light_index.get(intersection)
+            if k is not None:
+                self.ns_green[k] = timing["north_south"]
+                self.ew_green[k] = timing["east_west"]
+
+    def sync_traffic_lights(self):
+        """Write the engine's light phases back into the city graph's light dictionaries"""
+        lights = self.city_graph.traffic_lights
+        for k, intersection in enumerate(self.light_ids):
+            light = lights[intersection]
+            light["north_south"]["current_state"] = "green" if self.ns_state[k] == GREEN else "red"
+            light["east_west"]["current_state"] = "green" if self.ew_state[k] == GREEN else "red"
+            light["north_south"]["time_in_state"] = int(self.ns_time[k])
+            light["east_west"]["time_in_state"] = int(self.ew_time[k])
@@ -0,0 +1,122 @@
+import heapq
+import math
+import random
+
+def _is_rate(value):
+    """Whether value is a finite, non-negative number"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+
+class DemandGenerator:
+    """
+    Spawns vehicles into a TrafficSimulator from origin-destination rates.
+    Each OD stream is a Poisson process whose rate can be scaled by a
+    time-of-day profile (non-homogeneous arrivals are drawn by thinning).
+    """
+    def __init__(self, city_graph, od_rates=None, random_rate=0.0, profile=None, steps_per_day=1440):
+        """
+        Args:
+            city_graph: CityGraph object
+            od_rates: List of {'origin', 'destination', 'rate'} dicts, rate in
+                vehicles per time step
+            random_rate: Vehicles per time step between random node pairs
+            profile: List of time-of-day multipliers spread evenly over a day
+                (e.g. 24 hourly values); None means a flat profile
+            steps_per_day: Number of time steps in one simulated day
+        
+        Raises:
+            ValueError: If a rate, profile value or steps_per_day is invalid,
+                or an OD stream names an unknown node
+        """
+        if not _is_rate(steps_per_day) or steps_per_day <= 0:
+            raise ValueError("steps_per_day must be a positive number")
+        if not _is_rate(random_rate):
+            raise ValueError("random_rate must be a non-negative number")
+        if profile is not None and (
+            not isinstance(profile, (list, tuple)) or not all(_is_rate(value) for value in profile)
+        ):
+            raise ValueError("profile must be a list of non-negative numbers")
+        if od_rates is not None and not isinstance(od_rates, (list, tuple)):
+            raise ValueError("od_rates must be a list")
+        for od in od_rates or []:
+            if not isinstance(od, dict) or not _is_rate(od.get('rate')):
+                raise ValueError("Each OD rate needs a non-negative numeric rate")
+            for key in ('origin', 'destination'):
+                if not isinstance(od.get(key), str) or not city_graph.has_node(od[key]):
+                    raise ValueError(f"Unknown OD {key}: {od.get(key)!r}")
+        
+        self.city_graph = city_graph
+        self.profile = list(profile) if profile else [1.0]
+        self.steps_per_day = steps_per_day
+        self.max_multiplier = max(self.profile)
+
+        # A stream with origin/destination None draws a random pair per vehicle
+        self.streams = []
+        for od in od_rates or []:
+            if od.get('rate', 0) > 0:
+                self.streams.append((od['origin'], od['destination'], od['rate']))
+        if random_rate > 0:
+            self.streams.append((None, None, random_rate))
+
+        self.reset(0)
+
+    @classmethod
+    def from_config(cls, city_graph, config):
+        """Build a generator from a JSON-style config dictionary"""
+        return cls(
+            city_graph,
+            od_rates=config.get('odRates', config.get('od_rates')),
+            random_rate=config.get('randomRate', config.get('random_rate', 0.0)),
+            profile=config.get('profile'),
+            steps_per_day=config.get('stepsPerDay', config.get('steps_per_day', 1440))
+        )
+
+    def reset(self, time_step=0):
+        """Restart every stream from the given time step"""
+        self.spawned = 0
+        self._queue = []
+        for stream_idx in range(len(self.streams)):
+            self._schedule(stream_idx, time_step)
+
+    def rate_multiplier(self, time_step):
+        """Time-of-day multiplier for the given time step"""
+        phase = (time_step % self.steps_per_day) / self.steps_per_day
+        return self.profile[min(len(self.profile) - 1, int(phase * len(self.profile)))]
+
+    def _schedule(self, stream_idx, after):
+        """Draw the next candidate arrival of a stream at the profile's peak rate"""
+        peak_rate = self.streams[stream_idx][2] * self.max_multiplier
+        if peak_rate <= 0:
+            return
+        heapq.heappush(self._queue, (after + random.expovariate(peak_rate), stream_idx))
+
+    def next_event_time(self):
+        """Time of the next candidate arrival, or None if there is no demand"""
+        return self._queue[0][0] if self._queue else None
+
+    def generate(self, simulator):
+        """Spawn every vehicle due at or before the simulator's current time step"""
+        nodes = None
+        spawned = []
+
+        while self._queue and self._queue[0][0] <= simulator.time_step:
+            arrival_time, stream_idx = heapq.heappop(self._queue)
+            self._schedule(stream_idx, arrival_time)
+
+            # Thinning: accept the candidate with probability rate(t) / peak rate
+            if self.max_multiplier > 0 and random.random() * self.max_multiplier > self.rate_multiplier(arrival_time):
+                continue
+
+            origin, destination, _ = self.streams[stream_idx]
+            if origin is None:
+                if nodes is None:
+                    nodes = self.city_graph.node_ids()
+                if len(nodes) < 2:
+                    continue
+                origin, destination = random.sample(nodes, 2)
+
+            vehicle_id = simulator.spawn_vehicle(origin, destination)
+            if vehicle_id:
+                spawned.append(vehicle_id)
+
+        self.spawned += len(spawned)
+        return spawned
@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import pickle
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .trip_log import CompletedTripLog
+
+# Set in every worker process by _init_worker
+_worker_snapshot = None
+_worker_cancel_event = None
+
+def _init_worker(snapshot, cancel_event):
+    """Store the common starting state and the cancel flag in the worker"""
+    global _worker_snapshot, _worker_cancel_event
+    _worker_snapshot = snapshot
+    _worker_cancel_event = cancel_event
+
+def _apply_variation(simulator, variation):
+    """Apply one member's incidents and signal-timing changes to a forked simulator"""
+    for incident in variation.get('incidents', []):
+        simulator.add_incident(
+            incident.get('location'),
+            incident.get('type', 'accident'),
+            incident.get('duration', 10),
+            road_id=incident.get('road_id', incident.get('roadId')),
+            severity=incident.get('severity')
+        )
+
+    timings = variation.get('signal_timings', variation.get('signalTimings'))
+    if timings:
+        simulator.city_graph.update_traffic_light_timings(timings)
+
+    # Scale every green time by a random factor in [1 - jitter, 1 + jitter]
+    jitter = variation.get('signal_jitter', variation.get('signalJitter', 0))
+    if jitter:
+        for light in simulator.city_graph.traffic_lights.values():
+            for direction in ('north_south', 'east_west'):
+                scaled = light[direction]['green_time'] * random.uniform(1 - jitter, 1 + jitter)
+                light[direction]['green_time'] = max(1, int(round(scaled)))
+
+def _run_member(member_idx, seed, variation, steps, road_ids, check_every=50):
+    """Run one ensemble member from the shared snapshot and summarize it"""
+    random.seed(seed)
+    simulator = pickle.loads(_worker_snapshot)
+    _apply_variation(simulator, variation)
+
+    # Reset the trip log so statistics only cover this run
+    simulator.trip_log = CompletedTripLog(simulator.trip_log.bin_width, simulator.trip_log.num_bins)
+
+    density_sum = np.zeros(len(road_ids))
+    for step_idx in range(steps):
+        if step_idx % check_every == 0 and _worker_cancel_event.is_set():
+            return None
+
+        simulator.step()
+        density = simulator.traffic_density
+        density_sum += np.fromiter((density.get(road_id, 0) for road_id in road_ids), float, len(road_ids))
+
+    return {
+        'member': member_idx,
+        'seed': seed,
+        'trip_log': simulator.trip_log,
+        'mean_density': density_sum / max(1, steps)
+    }
+
+class EnsembleAggregate:
+    """Running aggregate of finished ensemble members"""
+    def __init__(self, road_ids, percentiles=(10, 50, 90)):
+        self.road_ids = road_ids
+        self.percentiles = percentiles
+        self.pooled_trips = CompletedTripLog()
+        self.member_mean_travel_times = []
+        self.member_densities = []
+
+    def add(self, result):
+        """Fold one member result into the aggregate"""
+        self.pooled_trips.merge(result['trip_log'])
+        self.member_mean_travel_times.append(result['trip_log'].mean())
+        self.member_densities.append(result['mean_density'])
+
+    def to_dict(self):
+        """Return aggregated travel-time and per-road density statistics"""
+        if not self.member_densities:
+            return {'members': 0}
+
+        means = np.array(self.member_mean_travel_times)
+        densities = np.vstack(self.member_densities)
+        density_percentiles = np.percentile(densities, self.percentiles, axis=0)
+        density_mean = densities.mean(axis=0)
+
+        return {
+            'members': len(self.member_densities),
+            'travelTime': {
+                'pooled': self.pooled_trips.to_dict(),
+                'memberMean': float(means.mean()),
+                'memberPercentiles': {
+                    f"p{q}": float(v) for q, v in zip(self.percentiles, np.percentile(means, self.percentiles))
+                }
+            },
+            'roadDensity': {
+                road_id: dict(
+                    mean=float(density_mean[i]),
+                    **{f"p{q}": float(density_percentiles[k][i]) for k, q in enumerate(self.percentiles)}
+                )
+                for i, road_id in enumerate(self.road_ids)
+            }
+        }
+
+class EnsembleJob:
+    """
+    Runs N independent copies of a simulator, forked from its current state,
+    in a process pool. Each member gets its own seed and optional variation;
+    results are aggregated as members finish so progress can be polled.
+    """
+    def __init__(self, simulator, num_runs, steps, seed=0, variations=None, max_workers=None):
+        """
+        Args:
+            simulator: TrafficSimulator whose current state every member starts from
+            num_runs: Number of ensemble members
+            steps: Time steps to simulate per member
+            seed: Base seed; member i uses seed + i
+            variations: List of variation dicts (incidents, signal_timings,
+                signal_jitter), assigned to members round-robin
+            max_workers: Process pool size (defaults to, and is capped at,
+                the CPU count)
+        
+        Raises:
+            ValueError: If num_runs, steps or max_workers is not a positive
+                integer, or variations is not a list
+        """
+        for name, value in (('num_runs', num_runs), ('steps', steps), ('max_workers', max_workers)):
+            if name == 'max_workers' and value is None:
+                continue
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ValueError(f"{name} must be a positive integer")
+        if variations is not None and not isinstance(variations, list):
+            raise ValueError("variations must be a list")
+        
+        cpu_count = os.cpu_count() or 1
+        
+        self.id = str(uuid.uuid4())
+        self.num_runs = num_runs
+        self.steps = steps
+        self.seed = seed
+        self.variations = variations or [{}]
+        self.max_workers = min(max_workers or cpu_count, cpu_count, num_runs)
+
+        # Fork the common starting state once
+        self._snapshot = pickle.dumps(simulator)
+        self.road_ids = sorted(simulator.get_traffic_density().keys())
+
+        self.status = 'pending'
+        self.completed = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.aggregate = EnsembleAggregate(self.road_ids)
+
+        self._lock = threading.Lock()
+        self._cancel_event = multiprocessing.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the job in a background thread"""
+        self.status = 'running'
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self._snapshot, self._cancel_event)
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _run_member, i, self.seed + i,
+                        self.variations[i % len(self.variations)],
+                        self.steps, self.road_ids
+                    )
+                    for i in range(self.num_runs)
+                ]
+
+                for future in as_completed(futures):
+                    if self._cancel_event.is_set():
+                        for pending in futures:
+                            pending.cancel()
+                        break
+
+                    result = future.result()
+                    if result is None:
+                        continue
+
+                    with self._lock:
+                        self.aggregate.add(result)
+                        self.completed += 1
+
+            self.status = 'cancelled' if self._cancel_event.is_set() else 'completed'
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'failed'
+        finally:
+            # The starting state is only needed to launch members
+            self._snapshot = None
+            self.finished_at = time.time()
+
+    def cancel(self):
+        """Stop the job; running members exit at their next check"""
+        if self.status in ('pending', 'running'):
+            self._cancel_event.set()
+            return True
+        return False
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'cancelled', 'failed')
+    
+    def join(self, timeout=None):
+        """Wait for the background thread to finish"""
+        if self._thread:
+            self._thread.join(timeout)
+
+    def to_dict(self):
+        """Return job progress and the current aggregated statistics"""
+        with self._lock:
+            results = self.aggregate.to_dict()
+
+        end = self.finished_at or time.time()
+        return {
+            'id': self.id,
+            'status': self.status,
+            'completed': self.completed,
+            'total': self.num_runs,
+            'progress': self.completed / self.num_runs if self.num_runs else 1.0,
+            'elapsed': end - self.started_at if self.started_at else 0,
+            'error': self.error,
+            'results': results
+        }
@@ -0,0 +1,33 @@
+class RouteIndex:
+    """
+    Maps each road to the vehicles whose remaining route still uses it, so
+    the vehicles affected by a change on one road can be found without
+    scanning the whole fleet.
+    """
+    def __init__(self):
+        self.vehicles_by_road = {}
+
+    def add(self, vehicle_id, road_ids):
+        """Register roads a vehicle will still travel on"""
+        for road_id in road_ids:
+            vehicles = self.vehicles_by_road.get(road_id)
+            if vehicles is None:
+                vehicles = self.vehicles_by_road[road_id] = set()
+            vehicles.add(vehicle_id)
+
+    def remove(self, vehicle_id, road_ids):
+        """Forget roads a vehicle has passed or no longer plans to use"""
+        for road_id in road_ids:
+            vehicles = self.vehicles_by_road.get(road_id)
+            if vehicles is None:
+                continue
+            vehicles.discard(vehicle_id)
+            if not vehicles:
+                del self.vehicles_by_road[road_id]
+
+    def vehicles_on(self, road_id):
+        """Return the set of vehicles whose remaining route uses road_id"""
+        return set(self.vehicles_by_road.get(road_id, ()))
+
+    def clear(self):
+        self.vehicles_by_road = {}
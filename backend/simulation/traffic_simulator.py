@@ -1,19 +1,71 @@
+import math
 import random
 import time
 import uuid
+from collections import deque
+
+from .trip_log import CompletedTripLog
+from .route_index import RouteIndex
 
 class TrafficSimulator:
     """
     Simulates traffic flow in the city, including vehicles, traffic density,
     and incidents.
     """
-    def __init__(self, city_graph, num_vehicles=50):
+    def __init__(self, city_graph, num_vehicles=50, demand=None):
         self.city_graph = city_graph
+        self.num_vehicles = num_vehicles
         self.vehicles = {}
         self.incidents = []
         self.traffic_density = {}
         self.time_step = 0
         
+        # Bumped by changes made outside step() (manual incidents, reroutes,
+        # demand and signal control changes, resets), so
+        # (time_step, state_version) identifies the simulation state
+        self.state_version = 0
+        
+        # Chance of a random incident per step
+        self.incident_probability = 0.05
+        
+        # Event-driven mode brings lights and road densities up to date only
+        # when something reads them: everything is current as of
+        # _synced_step, and the per-light / per-road ticks record the ones
+        # brought further
+        self._lazy = False
+        self._synced_step = 0
+        self._light_ticks = {}
+        self._density_ticks = {}
+        
+        self._edge_list = None
+        self._road_targets = None
+        self._roads_into = None
+        
+        # Optional DemandGenerator that keeps spawning vehicles
+        self.demand = demand
+        
+        # Arrived vehicles are retired into the trip log and their records
+        # are kept on a free list for reuse by newly spawned vehicles
+        self.trip_log = CompletedTripLog()
+        self._free_vehicle_records = []
+        
+        # Road -> vehicles whose remaining route uses it
+        self.route_index = RouteIndex()
+        
+        # Node -> vehicles currently at it, for viewport queries
+        self.vehicles_by_node = {}
+        
+        # Optional IncidentRerouter; while one is attached, incident
+        # additions/expiries are queued for it (an addition and expiry of the
+        # same incident cancel out) and, if its auto flag is set, it runs
+        # after every step
+        self.incident_rerouter = None
+        self.incident_events = []
+        
+        # Optional AdaptiveSignalController updated inside every step with
+        # the roads whose density changed
+        self.signal_controller = None
+        
         # Initialize vehicles
         self._initialize_vehicles(num_vehicles)
         
@@ -22,46 +74,111 @@ class TrafficSimulator:
     
     def _initialize_vehicles(self, num_vehicles):
         """Initialize random vehicles in the city"""
-        nodes = list(self.city_graph.graph.nodes())
+        nodes = self.city_graph.node_ids()
         
         for _ in range(num_vehicles):
-            vehicle_id = str(uuid.uuid4())
-            
             # Random start and end positions
             start_node = random.choice(nodes)
             end_node = random.choice([n for n in nodes if n != start_node])
             
-            # Find initial route
-            route = self._find_initial_route(start_node, end_node)
+            self.spawn_vehicle(start_node, end_node)
+    
+    def spawn_vehicle(self, start_node, end_node, vehicle_type=None):
+        """Add a vehicle travelling from start_node to end_node, reusing a retired record if possible"""
+        if not self.city_graph.has_node(start_node) or not self.city_graph.has_node(end_node):
+            return None
+        if start_node == end_node:
+            return None
+        
+        vehicle_id = str(uuid.uuid4())
+        
+        # Find initial route
+        route = self._find_initial_route(start_node, end_node)
+        
+        vehicle = self._free_vehicle_records.pop() if self._free_vehicle_records else {}
+        vehicle['current_position'] = None
+        self._place_vehicle(vehicle_id, vehicle, start_node)
+        vehicle['destination'] = end_node
+        vehicle['route'] = route
+        vehicle['progress'] = 0
+        vehicle['speed'] = random.uniform(0.5, 1.0)  # Speed factor
+        vehicle['type'] = vehicle_type or random.choice(['car', 'bus', 'truck'])
+        vehicle['status'] = 'moving'
+        vehicle['departure_step'] = self.time_step
+        
+        self.vehicles[vehicle_id] = vehicle
+        self.route_index.add(vehicle_id, self._route_roads(route, 0))
+        return vehicle_id
+    
+    def _retire_vehicles(self, vehicle_ids):
+        """Move arrived vehicles into the completed-trips log and free their records"""
+        for vehicle_id in vehicle_ids:
+            vehicle = self.vehicles.pop(vehicle_id, None)
+            if vehicle is None:
+                continue
+            
+            self.route_index.remove(vehicle_id, self._route_roads(vehicle['route'], int(vehicle['progress'])))
+            self._place_vehicle(vehicle_id, vehicle, None)
+            self.trip_log.record(
+                self.time_step - vehicle['departure_step'],
+                max(0, len(vehicle['route']) - 1)
+            )
             
-            self.vehicles[vehicle_id] = {
-                'current_position': start_node,
-                'destination': end_node,
-                'route': route,
-                'progress': 0,
-                'speed': random.uniform(0.5, 1.0),  # Speed factor
-                'type': random.choice(['car', 'bus', 'truck']),
-                'status': 'moving'
-            }
+            vehicle['route'] = []
+            self._free_vehicle_records.append(vehicle)
+    
+    def _place_vehicle(self, vehicle_id, vehicle, node):
+        """Set a vehicle's current position (None to take it off the map) and keep vehicles_by_node in sync"""
+        old_node = vehicle['current_position']
+        if old_node == node:
+            return
+        if old_node is not None:
+            at_node = self.vehicles_by_node[old_node]
+            at_node.discard(vehicle_id)
+            if not at_node:
+                del self.vehicles_by_node[old_node]
+        if node is not None:
+            self.vehicles_by_node.setdefault(node, set()).add(vehicle_id)
+        vehicle['current_position'] = node
+    
+    def _route_roads(self, route, start_idx):
+        """Road IDs of a route from segment start_idx onward"""
+        roads = []
+        for idx in range(max(0, start_idx), len(route) - 1):
+            road_id = self.city_graph.road_id(route[idx], route[idx + 1])
+            if road_id is not None:
+                roads.append(road_id)
+        return roads
+    
+    def _set_route(self, vehicle_id, vehicle, route, progress):
+        """Replace a vehicle's route and keep the route index in sync"""
+        self.route_index.remove(vehicle_id, self._route_roads(vehicle['route'], int(vehicle['progress'])))
+        vehicle['route'] = route
+        vehicle['progress'] = progress
+        self.route_index.add(vehicle_id, self._route_roads(route, int(progress)))
     
     def _find_initial_route(self, start_node, end_node):
         """Find initial route for a vehicle"""
         try:
-            path = []
-            # Simple BFS for initial route
-            visited = {start_node}
-            queue = [(start_node, [start_node])]
+            # Simple BFS for initial route, keeping parent links instead of
+            # copying the partial path for every queued node
+            parents = {start_node: None}
+            queue = deque([start_node])
             
             while queue:
-                (node, path) = queue.pop(0)
+                node = queue.popleft()
                 
                 if node == end_node:
-                    return path
+                    path = []
+                    while node is not None:
+                        path.append(node)
+                        node = parents[node]
+                    return path[::-1]
                 
-                for neighbor in self.city_graph.graph.neighbors(node):
-                    if neighbor not in visited:
-                        visited.add(neighbor)
-                        queue.append((neighbor, path + [neighbor]))
+                for neighbor in self.city_graph.successors(node):
+                    if neighbor not in parents:
+                        parents[neighbor] = node
+                        queue.append(neighbor)
             
             return []  # No path found
         except Exception as e:
@@ -70,8 +187,7 @@ class TrafficSimulator:
     
     def _initialize_traffic_density(self):
         """Initialize traffic density on all roads"""
-        for source, target, data in self.city_graph.graph.edges(data=True):
-            road_id = data['road_id']
+        for source, target, road_id in self.city_graph.roads():
             # Random initial traffic density (0-50)
             self.traffic_density[road_id] = random.randint(0, 50)
     
@@ -79,26 +195,187 @@ class TrafficSimulator:
         """Advance simulation by one time step"""
         self.time_step += 1
         
-        # Update traffic lights
-        self.city_graph.step_traffic_lights()
+        # Update traffic lights (in event-driven mode each light catches up
+        # when a vehicle approaches it)
+        if not self._lazy:
+            self.city_graph.step_traffic_lights()
         
         # Move vehicles
         self._move_vehicles()
         
         # Update traffic density
-        self._update_traffic_density()
+        changed_roads = self._update_traffic_density()
+        
+        # Adapt signal timings at intersections whose demand changed
+        if self.signal_controller:
+            if self._lazy:
+                self._sync_intersections(changed_roads)
+            self.signal_controller.update(self.traffic_density, changed_roads)
         
         # Update incidents (reduce duration, remove expired)
         self._update_incidents()
         
         # Randomly add new incidents (small probability)
-        if random.random() < 0.05:  # 5% chance per step
+        if self._random_incident_due():
             self._add_random_incident()
+        
+        self._react_and_spawn()
+    
+    def _random_incident_due(self):
+        """Draw whether a random incident starts at the current step"""
+        # No draw when incidents are off, so the random stream seen by
+        # demand does not depend on how many steps were simulated one by one
+        return self.incident_probability > 0 and random.random() < self.incident_probability
+    
+    def _react_and_spawn(self):
+        """End-of-step work shared by step() and event-driven idle steps"""
+        # React to incidents that appeared or expired this step; rerouting
+        # weighs every road, so deferred densities are brought up to date
+        if self.incident_rerouter and self.incident_rerouter.auto:
+            if self._lazy and self.incident_events and self.vehicles:
+                self._catch_up()
+            self.incident_rerouter.process(self)
+        
+        # Spawn new demand
+        if self.demand:
+            self.demand.generate(self)
+    
+    def advance(self, steps, event_driven=False):
+        """
+        Advance the simulation by `steps` time steps.
+        
+        In event-driven mode, lights and road densities are only brought up
+        to date (in closed form) when something reads them: a light when a
+        vehicle approaches it, a road when a vehicle is on it. Steps with
+        vehicles therefore cost time proportional to the vehicles rather
+        than to the network, and stretches with no vehicles jump from one
+        event to the next: an incident expiring, a random incident, or the
+        next demand arrival. Everything is caught up at the end (and before
+        an automatic reroute, which weighs every road), giving the same
+        state as fixed-step mode.
+        """
+        end = self.time_step + steps
+        
+        if not event_driven:
+            while self.time_step < end:
+                self.step()
+            return
+        
+        self._lazy = True
+        self._synced_step = self.time_step
+        try:
+            while self.time_step < end:
+                if self.vehicles:
+                    self.step()
+                    continue
+                
+                next_event, incident_due = self._next_idle_event(end)
+                skipped = next_event - self.time_step - 1
+                for incident in self.incidents:
+                    incident['duration'] -= skipped
+                
+                # Process the event step itself; lights and densities lag
+                self.time_step = next_event
+                self._update_incidents()
+                
+                if incident_due:
+                    self._add_random_incident()
+                
+                self._react_and_spawn()
+        finally:
+            self._catch_up()
+            self._lazy = False
+    
+    def _next_idle_event(self, end):
+        """
+        First step at or before `end` at which something happens while no
+        vehicles move, and whether a random incident starts at it.
+        """
+        now = self.time_step
+        next_event = end
+        
+        for incident in self.incidents:
+            # _update_incidents removes an incident once its duration reaches 0
+            next_event = min(next_event, now + max(1, incident['duration']))
+        
+        if self.demand:
+            arrival = self.demand.next_event_time()
+            if arrival is not None:
+                next_event = min(next_event, max(now + 1, math.ceil(arrival)))
+        
+        next_event = max(now + 1, next_event)
+        
+        # Random incidents are drawn step by step as in step(), which keeps
+        # the random stream identical to fixed-step mode and is still far
+        # cheaper than simulating the steps
+        for tick in range(now + 1, next_event + 1):
+            if self._random_incident_due():
+                return tick, True
+        
+        return next_event, False
+    
+    def _current_light(self, intersection):
+        """Traffic light of an intersection, caught up to the current step"""
+        if self._lazy:
+            lag = self.time_step - self._light_ticks.get(intersection, self._synced_step)
+            if lag > 0:
+                self.city_graph.advance_traffic_light(intersection, lag)
+                self._light_ticks[intersection] = self.time_step
+        return self.city_graph.traffic_lights[intersection]
+    
+    def _sync_density(self, road_id, tick):
+        """Apply the pending decay of one road up to step `tick` (event-driven mode)"""
+        last = self._density_ticks.get(road_id, self._synced_step)
+        if tick > last:
+            if road_id in self.traffic_density:
+                self.traffic_density[road_id] *= 0.95 ** (tick - last)
+            self._density_ticks[road_id] = tick
+    
+    def _sync_intersections(self, road_ids):
+        """Catch up the lights and incoming road densities that the signal controller reads"""
+        if self._road_targets is None:
+            self._road_targets = {}
+            self._roads_into = {}
+            for source, target, road_id in self.city_graph.roads():
+                self._road_targets[road_id] = target
+                self._roads_into.setdefault(target, []).append(road_id)
+        
+        lights = self.city_graph.traffic_lights
+        for intersection in {self._road_targets.get(road_id) for road_id in road_ids}:
+            if intersection not in lights:
+                continue
+            self._current_light(intersection)
+            for incoming in self._roads_into[intersection]:
+                self._sync_density(incoming, self.time_step)
+    
+    def _catch_up(self):
+        """Bring every light and road density deferred in event-driven mode up to the current step"""
+        now = self.time_step
+        
+        for intersection in self.city_graph.traffic_lights:
+            self.city_graph.advance_traffic_light(
+                intersection, now - self._light_ticks.get(intersection, self._synced_step)
+            )
+        
+        traffic_density = self.traffic_density
+        density_ticks = self._density_ticks
+        synced_step = self._synced_step
+        for road_id, density in traffic_density.items():
+            lag = now - density_ticks.get(road_id, synced_step)
+            if lag > 0:
+                traffic_density[road_id] = density * 0.95 ** lag
+        
+        self._synced_step = now
+        self._light_ticks = {}
+        self._density_ticks = {}
     
     def _move_vehicles(self):
         """Move all vehicles along their routes"""
+        arrived = []
+        
         for vehicle_id, vehicle in self.vehicles.items():
             if vehicle['status'] == 'arrived':
+                arrived.append(vehicle_id)
                 continue
                 
             route = vehicle.get('route', [])
@@ -109,16 +386,16 @@ class TrafficSimulator:
                 # No valid route, try to find a new one
                 if vehicle['current_position'] != vehicle['destination']:
                     new_route = self._find_initial_route(vehicle['current_position'], vehicle['destination'])
-                    vehicle['route'] = new_route
-                    vehicle['progress'] = 0
+                    self._set_route(vehicle_id, vehicle, new_route, 0)
                 continue
             
             # Calculate current road segment
             current_idx = int(progress)
             if current_idx >= len(route) - 1:
                 # Vehicle has arrived at destination
-                vehicle['current_position'] = vehicle['destination']
+                self._place_vehicle(vehicle_id, vehicle, vehicle['destination'])
                 vehicle['status'] = 'arrived'
+                arrived.append(vehicle_id)
                 continue
             
             current_node = route[current_idx]
@@ -126,6 +403,7 @@ class TrafficSimulator:
             
             # Check if the next intersection has a red light
             if next_node in self.city_graph.traffic_lights:
+                light = self._current_light(next_node)
                 # Determine direction (north-south or east-west)
                 current_parts = current_node.split('_')
                 next_parts = next_node.split('_')
@@ -137,16 +415,12 @@ class TrafficSimulator:
                     direction = "north_south" if current_i == next_i else "east_west"
                     
                     # Check if light is red for this direction
-                    if self.city_graph.traffic_lights[next_node][direction]['current_state'] == 'red':
+                    if light[direction]['current_state'] == 'red':
                         # Slow down vehicle approaching red light
                         speed *= 0.2
             
             # Check for incidents on the current road
-            road_id = None
-            for s, t, data in self.city_graph.graph.edges(data=True):
-                if s == current_node and t == next_node:
-                    road_id = data['road_id']
-                    break
+            road_id = self.city_graph.road_id(current_node, next_node)
             
             if road_id:
                 for incident in self.incidents:
@@ -154,7 +428,9 @@ class TrafficSimulator:
                         # Slow down vehicle on road with incident
                         speed *= (1 - incident['severity'])
             
-            # Check traffic density on current road
+            # Check traffic density on current road (as left by the last step)
+            if self._lazy and road_id:
+                self._sync_density(road_id, self.time_step - 1)
             if road_id and road_id in self.traffic_density:
                 density = self.traffic_density[road_id]
                 # Slow down based on traffic density (0-100)
@@ -165,13 +441,21 @@ class TrafficSimulator:
             
             # Update current position if moved to next node
             if int(vehicle['progress']) > current_idx:
-                vehicle['current_position'] = route[int(vehicle['progress'])]
+                self._place_vehicle(vehicle_id, vehicle, route[int(vehicle['progress'])])
+                if road_id:
+                    self.route_index.remove(vehicle_id, [road_id])
+        
+        self._retire_vehicles(arrived)
     
     def _update_traffic_density(self):
         """Update traffic density based on vehicle positions"""
-        # Decay current traffic density (traffic dissipates over time)
-        for road_id in self.traffic_density:
-            self.traffic_density[road_id] = max(0, self.traffic_density[road_id] * 0.95)
+        # Decay current traffic density (traffic dissipates over time);
+        # densities are never negative so no clamping is needed. In
+        # event-driven mode only the roads with vehicles decay now
+        traffic_density = self.traffic_density
+        if not self._lazy:
+            for road_id, density in traffic_density.items():
+                traffic_density[road_id] = density * 0.95
         
         # Count vehicles on each road segment
         road_counts = {}
@@ -194,13 +478,11 @@ class TrafficSimulator:
             next_node = route[current_idx + 1]
             
             # Find the road ID for this segment
-            for s, t, data in self.city_graph.graph.edges(data=True):
-                if s == current_node and t == next_node:
-                    road_id = data['road_id']
-                    if road_id not in road_counts:
-                        road_counts[road_id] = 0
-                    road_counts[road_id] += 1
-                    break
+            road_id = self.city_graph.road_id(current_node, next_node)
+            if road_id is not None:
+                if road_id not in road_counts:
+                    road_counts[road_id] = 0
+                road_counts[road_id] += 1
         
         # Update traffic density based on vehicle counts
         for road_id, count in road_counts.items():
@@ -208,10 +490,16 @@ class TrafficSimulator:
             # Assuming capacity is around 20 vehicles per road
             density_increase = min(100, count * 5)
             
+            if self._lazy:
+                self._sync_density(road_id, self.time_step)
+            
             if road_id in self.traffic_density:
                 self.traffic_density[road_id] = min(100, self.traffic_density[road_id] + density_increase)
             else:
                 self.traffic_density[road_id] = density_increase
+        
+        # Every other road only decayed, which leaves demand ratios unchanged
+        return road_counts.keys()
     
     def _update_incidents(self):
         """Update and remove expired incidents"""
@@ -222,18 +510,22 @@ class TrafficSimulator:
             
             if incident['duration'] > 0:
                 updated_incidents.append(incident)
+            else:
+                self._record_incident_event('expired', incident)
         
         self.incidents = updated_incidents
     
     def _add_random_incident(self):
         """Add a random traffic incident"""
-        # Choose a random road
-        edges = list(self.city_graph.graph.edges(data=True))
+        # Choose a random road; the edge list is built once since the
+        # road network does not change during a simulation
+        if self._edge_list is None:
+            self._edge_list = self.city_graph.roads()
+        edges = self._edge_list
         if not edges:
             return
             
-        source, target, data = random.choice(edges)
-        road_id = data['road_id']
+        source, target, road_id = random.choice(edges)
         
         # Create incident
         incident = {
@@ -246,19 +538,33 @@ class TrafficSimulator:
         }
         
         self.incidents.append(incident)
+        self._record_incident_event('added', incident)
     
-    def get_vehicle_positions(self):
-        """Return current positions of all vehicles"""
+    def get_vehicle_positions(self, nodes=None):
+        """Return current positions of all vehicles, or only of those at the given nodes"""
+        if nodes is None:
+            vehicle_ids = self.vehicles
+        else:
+            vehicle_ids = [
+                vehicle_id
+                for node in nodes
+                for vehicle_id in self.vehicles_by_node.get(node, ())
+            ]
+        
         return {
             vehicle_id: {
-                'current_position': vehicle['current_position'],
-                'destination': vehicle['destination'],
-                'type': vehicle['type'],
-                'status': vehicle['status']
+                'current_position': self.vehicles[vehicle_id]['current_position'],
+                'destination': self.vehicles[vehicle_id]['destination'],
+                'type': self.vehicles[vehicle_id]['type'],
+                'status': self.vehicles[vehicle_id]['status']
             }
-            for vehicle_id, vehicle in self.vehicles.items()
+            for vehicle_id in vehicle_ids
         }
     
+    def count_vehicles_at(self, nodes):
+        """Number of vehicles currently at the given nodes"""
+        return sum(len(self.vehicles_by_node.get(node, ())) for node in nodes)
+    
     def get_traffic_density(self):
         """Return current traffic density on all roads"""
         return self.traffic_density
@@ -267,19 +573,37 @@ class TrafficSimulator:
         """Return current traffic incidents"""
         return self.incidents
     
-    def add_incident(self, location, incident_type='accident', duration=10):
-        """Add a traffic incident at a specific location"""
+    def get_trip_statistics(self):
+        """Return travel-time statistics of completed trips and current fleet size"""
+        stats = self.trip_log.to_dict()
+        stats['active_vehicles'] = len(self.vehicles)
+        stats['spawned_vehicles'] = self.demand.spawned if self.demand else 0
+        return stats
+    
+    def set_demand(self, demand):
+        """Attach (or detach with None) a DemandGenerator"""
+        self.demand = demand
+        self.state_version += 1
+        if self.demand:
+            self.demand.reset(self.time_step)
+    
+    def add_incident(self, location, incident_type='accident', duration=10, road_id=None, severity=None):
+        """
+        Add a traffic incident at a specific location. A random outgoing road
+        is affected unless road_id names one; severity is random unless given.
+        """
         # Find roads connected to this location
-        if location not in self.city_graph.graph:
+        if not self.city_graph.has_node(location):
             return False
         
-        # Choose a random outgoing edge
-        edges = list(self.city_graph.graph.out_edges(location, data=True))
+        edges = self.city_graph.out_roads(location)
+        if road_id is not None:
+            edges = [edge for edge in edges if edge[1] == road_id]
         if not edges:
             return False
-            
-        _, target, data = random.choice(edges)
-        road_id = data['road_id']
+        
+        # Choose a random outgoing edge
+        target, road_id = random.choice(edges)
         
         # Create incident
         incident = {
@@ -287,33 +611,93 @@ class TrafficSimulator:
             'road_id': road_id,
             'location': location,
             'type': incident_type,
-            'severity': random.uniform(0.5, 0.9),
+            'severity': severity if severity is not None else random.uniform(0.5, 0.9),
             'duration': duration
         }
         
         self.incidents.append(incident)
+        self._record_incident_event('added', incident)
+        self.state_version += 1
         return True
     
     def update_vehicle_routes(self, new_routes):
         """Update routes for vehicles based on suggestions"""
+        changed = False
         for vehicle_id, route_data in new_routes.items():
             if vehicle_id in self.vehicles and 'path' in route_data:
-                self.vehicles[vehicle_id]['route'] = route_data['path']
+                vehicle = self.vehicles[vehicle_id]
+                if route_data['path'] == vehicle['route']:
+                    continue
+                
                 # Reset progress to current position in new route
-                current_pos = self.vehicles[vehicle_id]['current_position']
+                current_pos = vehicle['current_position']
                 if current_pos in route_data['path']:
-                    self.vehicles[vehicle_id]['progress'] = route_data['path'].index(current_pos)
+                    progress = route_data['path'].index(current_pos)
                 else:
-                    self.vehicles[vehicle_id]['progress'] = 0
+                    progress = 0
+                self._set_route(vehicle_id, vehicle, route_data['path'], progress)
+                changed = True
+        
+        if changed:
+            self.state_version += 1
+    
+    def set_signal_controller(self, controller):
+        """Attach (or detach with None) an AdaptiveSignalController"""
+        self.signal_controller = controller
+        self.state_version += 1
+    
+    def set_incident_rerouter(self, rerouter):
+        """Attach (or detach with None) an IncidentRerouter"""
+        self.incident_rerouter = rerouter
+        self.incident_events = []
+    
+    def _record_incident_event(self, kind, incident):
+        if self.incident_rerouter is None:
+            return
+        
+        # An incident that clears before anyone saw it being added cancels
+        # out, so the queue never holds more than the incidents active now
+        # and at the last drain
+        if kind == 'expired':
+            for idx, (queued_kind, queued) in enumerate(self.incident_events):
+                if queued_kind == 'added' and queued is incident:
+                    del self.incident_events[idx]
+                    return
+        
+        self.incident_events.append((kind, incident))
+    
+    def drain_incident_events(self):
+        """Return and clear the ('added' | 'expired', incident) events since the last call"""
+        events = self.incident_events
+        self.incident_events = []
+        return events
     
     def reset(self):
         """Reset the simulation to initial state"""
         # Keep the same city graph but reset everything else
-        num_vehicles = len(self.vehicles)
         self.vehicles = {}
         self.incidents = []
         self.traffic_density = {}
         self.time_step = 0
+        self.state_version += 1
+        self._synced_step = 0
+        self._light_ticks = {}
+        self._density_ticks = {}
+        self._edge_list = None
+        self._road_targets = None
+        self._roads_into = None
+        self.trip_log.reset()
+        self._free_vehicle_records = []
+        self.route_index.clear()
+        self.vehicles_by_node = {}
+        self.incident_events = []
+        if self.incident_rerouter:
+            self.incident_rerouter.reset()
+        if self.signal_controller:
+            self.signal_controller.reset()
         
-        self._initialize_vehicles(num_vehicles)
+        self._initialize_vehicles(self.num_vehicles)
         self._initialize_traffic_density()
+        
+        if self.demand:
+            self.demand.reset(self.time_step)
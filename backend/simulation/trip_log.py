@@ -0,0 +1,99 @@
+import math
+
+class CompletedTripLog:
+    """
+    Compact log of completed trips. Keeps running travel-time statistics and
+    a fixed-size histogram instead of the vehicles themselves, so its memory
+    does not grow with the number of trips.
+    """
+    def __init__(self, bin_width=1, num_bins=500):
+        self.bin_width = bin_width
+        self.num_bins = num_bins
+        self.reset()
+
+    def reset(self):
+        """Clear all recorded trips"""
+        self.count = 0
+        self.total_travel_time = 0.0
+        self.total_squared_travel_time = 0.0
+        self.min_travel_time = None
+        self.max_travel_time = None
+        self.total_route_length = 0
+        # Last bin collects every trip longer than the histogram range
+        self.histogram = [0] * (self.num_bins + 1)
+
+    def record(self, travel_time, route_length=0):
+        """Record one completed trip"""
+        self.count += 1
+        self.total_travel_time += travel_time
+        self.total_squared_travel_time += travel_time * travel_time
+        self.total_route_length += route_length
+
+        if self.min_travel_time is None or travel_time < self.min_travel_time:
+            self.min_travel_time = travel_time
+        if self.max_travel_time is None or travel_time > self.max_travel_time:
+            self.max_travel_time = travel_time
+
+        bin_idx = min(self.num_bins, int(travel_time // self.bin_width))
+        self.histogram[bin_idx] += 1
+
+    def merge(self, other):
+        """Fold the trips of another log (with the same binning) into this one"""
+        self.count += other.count
+        self.total_travel_time += other.total_travel_time
+        self.total_squared_travel_time += other.total_squared_travel_time
+        self.total_route_length += other.total_route_length
+
+        for value in (other.min_travel_time, other.max_travel_time):
+            if value is None:
+                continue
+            if self.min_travel_time is None or value < self.min_travel_time:
+                self.min_travel_time = value
+            if self.max_travel_time is None or value > self.max_travel_time:
+                self.max_travel_time = value
+
+        for i, n in enumerate(other.histogram):
+            self.histogram[i] += n
+
+    def mean(self):
+        """Mean travel time in time steps (0 if no trips completed)"""
+        return self.total_travel_time / self.count if self.count else 0.0
+
+    def std(self):
+        """Standard deviation of travel time"""
+        if self.count < 2:
+            return 0.0
+        mean = self.mean()
+        variance = self.total_squared_travel_time / self.count - mean * mean
+        return math.sqrt(max(0.0, variance))
+
+    def percentile(self, q):
+        """Approximate travel-time percentile (q in 0-100) from the histogram"""
+        if not self.count:
+            return 0.0
+
+        target = self.count * q / 100
+        cumulative = 0
+        for bin_idx, n in enumerate(self.histogram):
+            cumulative += n
+            if cumulative >= target and n:
+                if bin_idx == self.num_bins:
+                    return self.max_travel_time
+                # Report the upper edge of the bin, clamped to observed values
+                upper = (bin_idx + 1) * self.bin_width
+                return max(self.min_travel_time, min(self.max_travel_time, upper))
+        return self.max_travel_time
+
+    def to_dict(self):
+        """Return the summary statistics"""
+        return {
+            'completed_trips': self.count,
+            'mean_travel_time': self.mean(),
+            'std_travel_time': self.std(),
+            'min_travel_time': self.min_travel_time or 0,
+            'max_travel_time': self.max_travel_time or 0,
+            'p50_travel_time': self.percentile(50),
+            'p90_travel_time': self.percentile(90),
+            'p95_travel_time': self.percentile(95),
+            'mean_route_length': self.total_route_length / self.count if self.count else 0.0
+        }
@@ -0,0 +1,82 @@
+import threading
+
+class _Call:
+    """One in-flight computation that concurrent callers wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlightCache:
+    """
+    Coalesces concurrent calls and caches the latest result per name.
+
+    run(name, key, compute) returns the cached result if the last completed
+    call for `name` had the same key; otherwise, if a call with that key is
+    already running, it waits for it and shares its result; otherwise it runs
+    compute() itself. Keys are typically (time step, state version) so a
+    result is reused until the simulation advances or is changed. When
+    compute() itself changes the state, key_after() gives the key that
+    describes the state it left behind, and the result is cached under it.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}   # name -> (key, result)
+        self._in_flight = {}  # (name, key) -> _Call
+        self._stats = {}
+
+    def _count(self, name, field):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = {'hits': 0, 'coalesced': 0, 'misses': 0, 'errors': 0}
+        stats[field] += 1
+
+    def run(self, name, key, compute, key_after=None):
+        with self._lock:
+            cached = self._results.get(name)
+            if cached is not None and cached[0] == key:
+                self._count(name, 'hits')
+                return cached[1]
+
+            call = self._in_flight.get((name, key))
+            leader = call is None
+            if leader:
+                call = self._in_flight[(name, key)] = _Call()
+                self._count(name, 'misses')
+            else:
+                self._count(name, 'coalesced')
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._count(name, 'errors')
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[(name, key)]
+                if call.error is None:
+                    self._results[name] = (key_after() if key_after else key, call.result)
+            call.done.set()
+
+        return call.result
+
+    def invalidate(self, name=None):
+        """Drop cached results (all of them, or those of one name)"""
+        with self._lock:
+            if name is None:
+                self._results.clear()
+            else:
+                self._results.pop(name, None)
+
+    def get_stats(self):
+        """Hit, coalesce, miss and error counts per name"""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend is run from its own directory, with modules imported by their
+# top-level package names (models, simulation, algorithms)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+import copy
+
+import numpy as np
+import pytest
+
+from models.city_graph import CityGraph
+from simulation.cell_transmission import CellTransmissionSimulator, RED
+
+
+@pytest.mark.parametrize("incident_rate", [0, 0.3])
+def test_vehicles_are_conserved(incident_rate):
+    simulator = CellTransmissionSimulator(CityGraph(grid_size=6), incident_rate=incident_rate, seed=0)
+    initial = float(simulator.occupancy.sum())
+
+    for _ in range(300):
+        simulator.step()
+        totals = simulator.get_network_totals()
+        assert initial + totals['entered'] - totals['exited'] == pytest.approx(totals['vehicles_in_network'])
+        assert simulator.occupancy.min() >= -1e-9
+        assert np.all(simulator.occupancy <= simulator.jam + 1e-9)
+
+
+def test_red_lights_block_outflow():
+    simulator = CellTransmissionSimulator(CityGraph(grid_size=5), initial_density=(30, 60), seed=1)
+    lit_ends = simulator.edge_last[simulator.lit_edges]
+
+    # Every light red in both directions, and long enough not to switch
+    simulator.ns_state[:] = RED
+    simulator.ew_state[:] = RED
+    simulator.ns_time[:] = 0
+    simulator.ew_time[:] = 0
+    simulator.ns_green[:] = 1000
+    simulator.ew_green[:] = 1000
+
+    before = simulator.occupancy[lit_ends].copy()
+    simulator.step()
+
+    # Nothing leaves a road into a signalized intersection
+    assert np.all(simulator.occupancy[lit_ends] >= before - 1e-12)
+
+    # Turning them green lets traffic through
+    simulator.ns_state[:] = 1 - RED
+    simulator.ew_state[:] = 1 - RED
+    before = simulator.occupancy[lit_ends].copy()
+    simulator.step()
+    assert np.any(simulator.occupancy[lit_ends] < before)
+
+
+def test_light_phases_match_city_graph_after_sync():
+    city_graph = CityGraph(grid_size=5)
+    reference = copy.deepcopy(city_graph.traffic_lights)
+    simulator = CellTransmissionSimulator(city_graph, seed=2)
+
+    for _ in range(137):
+        simulator.step()
+    simulator.sync_traffic_lights()
+
+    stepped = CityGraph(grid_size=1)
+    stepped.traffic_lights = reference
+    for _ in range(137):
+        stepped.step_traffic_lights()
+    assert city_graph.traffic_lights == stepped.traffic_lights
@@ -0,0 +1,54 @@
+import random
+
+from models.city_graph import CityGraph
+from simulation.traffic_simulator import TrafficSimulator
+from simulation.demand import DemandGenerator
+
+
+def _edges(city_graph):
+    return sorted(
+        (source, target, data["road_id"], data["weight"], data["capacity"], data["current_flow"])
+        for source, target, data in city_graph.graph.edges(data=True)
+    )
+
+
+def test_save_and_load_compiled_round_trip(tmp_path):
+    city_graph = CityGraph(grid_size=4)
+    city_graph.traffic_lights["intersection_1_1"]["north_south"]["green_time"] = 42
+    city_graph.step_traffic_lights()
+    path = tmp_path / "city.cgr"
+    city_graph.save_compiled(str(path))
+
+    for mmap in (True, False):
+        loaded = CityGraph.load_compiled(str(path), mmap=mmap)
+        assert loaded.traffic_lights == city_graph.traffic_lights
+        assert loaded.node_ids() == city_graph.node_ids()
+        assert sorted(loaded.roads()) == sorted(city_graph.roads())
+        assert _edges(loaded) == _edges(city_graph)
+        assert {node: data for node, data in loaded.graph.nodes(data=True)} == \
+            {node: data for node, data in city_graph.graph.nodes(data=True)}
+
+    assert CityGraph.load(str(path)).node_ids() == city_graph.node_ids()
+
+
+def test_simulator_runs_on_compiled_arrays(tmp_path):
+    path = tmp_path / "city.cgr"
+    CityGraph(grid_size=6).save_compiled(str(path))
+
+    results = []
+    for build_graph in (False, True):
+        city_graph = CityGraph.load_compiled(str(path))
+        if build_graph:
+            city_graph.graph
+        random.seed(3)
+        simulator = TrafficSimulator(city_graph, num_vehicles=20)
+        simulator.set_demand(DemandGenerator(city_graph, random_rate=0.2))
+        simulator.add_incident(city_graph.node_ids()[7])
+        simulator.advance(150)
+        simulator.advance(150, event_driven=True)
+        results.append((simulator.trip_log.to_dict(), simulator.traffic_density, len(simulator.incidents)))
+
+        # Without a prior request for it, the networkx graph was never built
+        assert (city_graph._graph is None) != build_graph
+
+    assert results[0] == results[1]
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from models.city_graph import CityGraph
+from simulation.traffic_simulator import TrafficSimulator
+from simulation.demand import DemandGenerator
+
+
+@pytest.mark.parametrize("config", [
+    {"stepsPerDay": 0, "randomRate": 1},
+    {"randomRate": -1},
+    {"randomRate": "1"},
+    {"profile": [1, "x"]},
+    {"profile": [1, -0.5]},
+    {"odRates": [{"origin": "intersection_0_0", "rate": 1}]},
+    {"odRates": [{"origin": "intersection_0_0", "destination": "nowhere", "rate": 1}]},
+    {"odRates": [{"origin": "intersection_0_0", "destination": "intersection_1_1", "rate": "fast"}]},
+    {"odRates": {"origin": "intersection_0_0"}},
+])
+def test_invalid_config_is_rejected(config):
+    with pytest.raises(ValueError):
+        DemandGenerator.from_config(CityGraph(grid_size=3), config)
+
+
+def test_reset_restarts_spawn_count():
+    random.seed(0)
+    city_graph = CityGraph(grid_size=4)
+    simulator = TrafficSimulator(city_graph, num_vehicles=0)
+    simulator.set_demand(DemandGenerator.from_config(city_graph, {
+        "odRates": [{"origin": "intersection_0_0", "destination": "intersection_3_3", "rate": 0.5}],
+        "randomRate": 0.5,
+        "profile": [0.5, 1.5],
+        "stepsPerDay": 100
+    }))
+    simulator.advance(50)
+    assert simulator.get_trip_statistics()["spawned_vehicles"] > 0
+
+    simulator.reset()
+    stats = simulator.get_trip_statistics()
+    assert stats["spawned_vehicles"] == 0
+    assert stats["completed_trips"] == 0
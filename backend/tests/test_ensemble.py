@@ -0,0 +1,40 @@
+import os
+import random
+
+import pytest
+
+from models.city_graph import CityGraph
+from simulation.traffic_simulator import TrafficSimulator
+from simulation.ensemble import EnsembleJob
+
+
+def _simulator():
+    random.seed(0)
+    return TrafficSimulator(CityGraph(grid_size=4), num_vehicles=10)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"num_runs": 0, "steps": 5},
+    {"num_runs": 2, "steps": "5"},
+    {"num_runs": 2, "steps": 5, "max_workers": 0},
+    {"num_runs": 2, "steps": 5, "variations": "none"},
+])
+def test_invalid_arguments_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        EnsembleJob(_simulator(), **kwargs)
+
+
+def test_workers_are_capped():
+    job = EnsembleJob(_simulator(), num_runs=3, steps=5, max_workers=10_000)
+    assert job.max_workers == min(3, os.cpu_count() or 1)
+
+
+def test_job_completes_and_releases_snapshot():
+    job = EnsembleJob(_simulator(), num_runs=2, steps=10, max_workers=1).start()
+    job.join(60)
+
+    result = job.to_dict()
+    assert job.finished
+    assert result['status'] == 'completed'
+    assert result['completed'] == 2
+    assert job._snapshot is None
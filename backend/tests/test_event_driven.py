@@ -0,0 +1,73 @@
+import copy
+import random
+
+import pytest
+
+from models.city_graph import CityGraph
+from simulation.traffic_simulator import TrafficSimulator
+from simulation.demand import DemandGenerator
+from algorithms.adaptive_signal_control import AdaptiveSignalController
+from algorithms.incident_rerouter import IncidentRerouter
+
+
+def test_advance_traffic_lights_matches_stepping():
+    rng = random.Random(0)
+    city_graph = CityGraph(grid_size=2)
+
+    for _ in range(3000):
+        light = {
+            "north_south": {
+                "green_time": rng.randint(0, 8),
+                "current_state": rng.choice(["green", "red"]),
+                "time_in_state": rng.randint(0, 10)
+            },
+            "east_west": {
+                "green_time": rng.randint(0, 8),
+                "current_state": rng.choice(["green", "red"]),
+                "time_in_state": rng.randint(0, 10)
+            }
+        }
+        ticks = rng.randint(0, 40)
+
+        city_graph.traffic_lights = {"a": copy.deepcopy(light)}
+        for _ in range(ticks):
+            city_graph.step_traffic_lights()
+        stepped = city_graph.traffic_lights["a"]
+
+        city_graph.traffic_lights = {"a": copy.deepcopy(light)}
+        city_graph.advance_traffic_lights(ticks)
+        assert city_graph.traffic_lights["a"] == stepped, (light, ticks)
+
+
+def _run(event_driven, seed, incident_probability, adaptive, reroute):
+    random.seed(seed)
+    city_graph = CityGraph(grid_size=6)
+    simulator = TrafficSimulator(city_graph, num_vehicles=5, demand=DemandGenerator(city_graph, random_rate=0.05))
+    simulator.incident_probability = incident_probability
+    if adaptive:
+        simulator.set_signal_controller(AdaptiveSignalController(city_graph))
+    if reroute:
+        simulator.set_incident_rerouter(IncidentRerouter(auto=True))
+
+    # Uneven chunks so event mode also starts and stops mid-stretch
+    for steps in (700, 1, 1299):
+        simulator.advance(steps, event_driven=event_driven)
+    return simulator
+
+
+@pytest.mark.parametrize("seed", [1, 5])
+@pytest.mark.parametrize("incident_probability", [0, 0.05])
+@pytest.mark.parametrize("adaptive,reroute", [(False, False), (True, True)])
+def test_event_mode_matches_fixed_steps(seed, incident_probability, adaptive, reroute):
+    fixed = _run(False, seed, incident_probability, adaptive, reroute)
+    event = _run(True, seed, incident_probability, adaptive, reroute)
+
+    assert event.time_step == fixed.time_step
+    assert event.trip_log.to_dict() == fixed.trip_log.to_dict()
+    assert len(event.vehicles) == len(fixed.vehicles)
+    assert [incident['road_id'] for incident in event.incidents] == [incident['road_id'] for incident in fixed.incidents]
+    assert event.city_graph.traffic_lights == fixed.city_graph.traffic_lights
+
+    assert event.traffic_density.keys() == fixed.traffic_density.keys()
+    for road_id, density in fixed.traffic_density.items():
+        assert event.traffic_density[road_id] == pytest.approx(density, rel=1e-9, abs=1e-12)
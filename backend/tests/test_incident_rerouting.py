@@ -0,0 +1,135 @@
+import random
+
+import pytest
+
+from models.city_graph import CityGraph
+from simulation.traffic_simulator import TrafficSimulator
+from simulation.demand import DemandGenerator
+from algorithms.incident_rerouter import IncidentRerouter
+from algorithms.vehicle_router import reroute_vehicles_batch, suggest_routes, MIN_SHARED_DESTINATION_BATCH
+
+
+def _simulator(num_vehicles=150, grid_size=8):
+    random.seed(1)
+    simulator = TrafficSimulator(CityGraph(grid_size=grid_size), num_vehicles=num_vehicles)
+    simulator.incident_probability = 0
+    return simulator
+
+
+def _recomputed_index(simulator):
+    expected = {}
+    for vehicle_id, vehicle in simulator.vehicles.items():
+        for road_id in simulator._route_roads(vehicle['route'], int(vehicle['progress'])):
+            expected.setdefault(road_id, set()).add(vehicle_id)
+    return expected
+
+
+def _busiest_road(simulator):
+    road_id = max(simulator.route_index.vehicles_by_road, key=lambda road: len(simulator.route_index.vehicles_by_road[road]))
+    location = next(source for source, _, road in simulator.city_graph.roads() if road == road_id)
+    return road_id, location
+
+
+@pytest.mark.parametrize("event_driven", [False, True])
+def test_route_index_matches_remaining_routes(event_driven):
+    random.seed(2)
+    city_graph = CityGraph(grid_size=8)
+    simulator = TrafficSimulator(city_graph, num_vehicles=100, demand=DemandGenerator(city_graph, random_rate=1))
+    simulator.incident_probability = 0.2
+    simulator.set_incident_rerouter(IncidentRerouter(auto=True))
+
+    for _ in range(5):
+        simulator.advance(40, event_driven=event_driven)
+        assert simulator.route_index.vehicles_by_road == _recomputed_index(simulator)
+
+
+def test_incident_reroutes_only_vehicles_planning_to_use_the_road():
+    simulator = _simulator()
+    rerouter = IncidentRerouter()
+    simulator.set_incident_rerouter(rerouter)
+    road_id, location = _busiest_road(simulator)
+    planned = simulator.route_index.vehicles_on(road_id)
+
+    simulator.add_incident(location, road_id=road_id, severity=0.9, duration=50)
+    new_routes = rerouter.process(simulator)
+
+    assert new_routes
+    assert set(new_routes) <= planned
+    detoured = rerouter.detoured[road_id]
+    assert detoured <= planned
+    assert not detoured & simulator.route_index.vehicles_on(road_id)
+    assert simulator.route_index.vehicles_by_road == _recomputed_index(simulator)
+
+
+def test_detoured_vehicles_are_rerouted_when_the_incident_expires():
+    simulator = _simulator()
+    rerouter = IncidentRerouter()
+    simulator.set_incident_rerouter(rerouter)
+    road_id, location = _busiest_road(simulator)
+
+    simulator.add_incident(location, road_id=road_id, severity=0.9, duration=3)
+    rerouter.process(simulator)
+    detoured = set(rerouter.detoured[road_id])
+    assert detoured
+
+    simulator.advance(3)
+    assert not simulator.incidents
+    returned = rerouter.process(simulator)
+
+    assert road_id not in rerouter.detoured
+    assert set(returned) == {vehicle_id for vehicle_id in detoured if vehicle_id in simulator.vehicles}
+
+
+def test_incident_that_clears_before_a_drain_leaves_no_events():
+    simulator = _simulator()
+    rerouter = IncidentRerouter()
+    simulator.set_incident_rerouter(rerouter)
+    road_id, location = _busiest_road(simulator)
+
+    simulator.add_incident(location, road_id=road_id, duration=1)
+    simulator.step()
+    assert simulator.incident_events == []
+    assert rerouter.process(simulator) == {}
+    assert rerouter.detoured == {}
+
+    # Once the addition has been drained, the expiry is still reported
+    simulator.add_incident(location, road_id=road_id, duration=1)
+    rerouter.process(simulator)
+    simulator.step()
+    assert [kind for kind, _ in simulator.incident_events] == ['expired']
+
+
+def test_no_events_are_queued_without_a_rerouter():
+    simulator = _simulator()
+    _, location = _busiest_road(simulator)
+    simulator.add_incident(location)
+    simulator.advance(20)
+    assert simulator.incident_events == []
+
+
+def test_batch_reroute_matches_per_vehicle_routes():
+    simulator = _simulator(num_vehicles=0, grid_size=6)
+    city_graph = simulator.city_graph
+    nodes = city_graph.node_ids()
+    rng = random.Random(4)
+
+    # One destination shared by enough vehicles for the reverse search, and
+    # a few vehicles routed one by one
+    vehicles = {}
+    for i in range(MIN_SHARED_DESTINATION_BATCH + 2):
+        vehicles[f"shared_{i}"] = {'current_position': rng.choice(nodes[1:]), 'destination': nodes[0]}
+    for i in range(3):
+        start, end = rng.sample(nodes, 2)
+        vehicles[f"single_{i}"] = {'current_position': start, 'destination': end}
+
+    traffic_data = {road_id: rng.uniform(0, 100) for _, _, road_id in city_graph.roads()}
+    incidents = [{'location': rng.choice(nodes), 'severity': 0.4}]
+
+    batch = reroute_vehicles_batch(city_graph, vehicles, traffic_data, incidents)
+    individual = suggest_routes(city_graph, vehicles, traffic_data, incidents)
+
+    assert set(batch) == set(individual)
+    for vehicle_id, route in batch.items():
+        assert route['path'][0] == vehicles[vehicle_id]['current_position']
+        assert route['path'][-1] == vehicles[vehicle_id]['destination']
+        assert route['length'] == pytest.approx(individual[vehicle_id]['length'])
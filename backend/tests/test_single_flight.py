@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from single_flight import SingleFlightCache
+
+
+def test_repeated_key_is_a_hit():
+    cache = SingleFlightCache()
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+
+    assert cache.run('a', (1, 0), compute) == 1
+    assert cache.run('a', (1, 0), compute) == 1
+    assert cache.run('a', (2, 0), compute) == 2
+    assert cache.get_stats()['a'] == {'hits': 1, 'coalesced': 0, 'misses': 2, 'errors': 0}
+
+
+def test_concurrent_calls_are_coalesced():
+    cache = SingleFlightCache()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.run('a', 1, compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while cache.get_stats().get('a', {}).get('coalesced', 0) < 7:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['result'] * 8
+    assert cache.get_stats()['a'] == {'hits': 0, 'coalesced': 7, 'misses': 1, 'errors': 0}
+
+
+def test_result_is_cached_under_key_after_mutation():
+    cache = SingleFlightCache()
+    state = {'version': 0}
+
+    def compute():
+        state['version'] += 1
+        return 'routes'
+
+    key = lambda: (5, state['version'])
+    cache.run('reroute', key(), compute, key_after=key)
+    cache.run('reroute', key(), compute, key_after=key)
+    cache.run('reroute', key(), compute, key_after=key)
+
+    assert state['version'] == 1
+    assert cache.get_stats()['reroute'] == {'hits': 2, 'coalesced': 0, 'misses': 1, 'errors': 0}
+
+
+def test_errors_are_not_cached():
+    cache = SingleFlightCache()
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.run('a', 1, fail)
+    assert cache.run('a', 1, lambda: 'ok') == 'ok'
+    assert cache.get_stats()['a']['errors'] == 1
+
+
+def test_invalidate_drops_results():
+    cache = SingleFlightCache()
+    cache.run('a', 1, lambda: 'first')
+    cache.run('b', 1, lambda: 'first')
+    cache.invalidate('a')
+
+    assert cache.run('a', 1, lambda: 'second') == 'second'
+    assert cache.run('b', 1, lambda: 'second') == 'first'
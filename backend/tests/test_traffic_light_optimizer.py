@@ -0,0 +1,24 @@
+import random
+
+import pytest
+
+from algorithms.traffic_light_optimizer import green_split
+
+
+@pytest.mark.parametrize("min_green,max_green,cycle_time", [(15, 60, 60), (15, 30, 60), (25, 40, 60), (0, 10, 20)])
+def test_green_split_stays_within_limits(min_green, max_green, cycle_time):
+    rng = random.Random(0)
+    for _ in range(2000):
+        north_south = rng.choice([0, rng.uniform(0, 300)])
+        east_west = rng.choice([0, rng.uniform(0, 300)])
+        ns_green, ew_green = green_split(north_south, east_west, min_green, max_green, cycle_time)
+
+        assert ns_green + ew_green == cycle_time
+        assert min_green <= ns_green <= max_green
+        assert min_green <= ew_green <= max_green
+
+
+@pytest.mark.parametrize("min_green,max_green,cycle_time", [(40, 60, 60), (15, 20, 60), (30, 20, 50)])
+def test_green_split_rejects_impossible_limits(min_green, max_green, cycle_time):
+    with pytest.raises(ValueError):
+        green_split(10, 90, min_green, max_green, cycle_time)
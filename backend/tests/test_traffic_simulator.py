@@ -0,0 +1,25 @@
+import random
+
+from models.city_graph import CityGraph
+from simulation.traffic_simulator import TrafficSimulator
+from simulation.demand import DemandGenerator
+
+
+def test_vehicles_by_node_tracks_positions():
+    random.seed(0)
+    city_graph = CityGraph(grid_size=8)
+    simulator = TrafficSimulator(city_graph, num_vehicles=100, demand=DemandGenerator(city_graph, random_rate=1))
+
+    for event_driven in (False, True):
+        simulator.advance(100, event_driven=event_driven)
+
+        expected = {}
+        for vehicle_id, vehicle in simulator.vehicles.items():
+            expected.setdefault(vehicle['current_position'], set()).add(vehicle_id)
+        assert simulator.vehicles_by_node == expected
+
+    nodes = city_graph.get_spatial_index().query_nodes((0, 0, 300, 300))
+    positions = simulator.get_vehicle_positions()
+    visible = {vehicle_id: vehicle for vehicle_id, vehicle in positions.items() if vehicle['current_position'] in nodes}
+    assert simulator.get_vehicle_positions(nodes) == visible
+    assert simulator.count_vehicles_at(nodes) == len(visible)
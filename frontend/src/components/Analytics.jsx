@@ -43,7 +43,8 @@ const Analytics = () => {
       // Calculate current metrics
       const vehicles = Object.values(trafficData.vehiclePositions)
       const movingVehicles = vehicles.filter((v) => v.status === "moving").length
-      const arrivedVehicles = vehicles.filter((v) => v.status === "arrived").length
+      // Arrived vehicles leave vehiclePositions; the backend counts them
+      const arrivedVehicles = trafficData.completedTrips || 0
 
       const densityValues = Object.values(trafficData.trafficDensity)
       const averageTrafficDensity =
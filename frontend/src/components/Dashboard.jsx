@@ -47,7 +47,8 @@ const Dashboard = () => {
       const vehicles = Object.values(trafficData.vehiclePositions)
       const totalVehicles = vehicles.length
       const movingVehicles = vehicles.filter((v) => v.status === "moving").length
-      const arrivedVehicles = vehicles.filter((v) => v.status === "arrived").length
+      // Arrived vehicles leave vehiclePositions; the backend counts them
+      const arrivedVehicles = trafficData.completedTrips || 0
 
       // Calculate average traffic density
       const densityValues = Object.values(trafficData.trafficDensity)
@@ -11,6 +11,7 @@ export const TrafficProvider = ({ children }) => {
     vehiclePositions: {},
     trafficDensity: {},
     incidents: [],
+    completedTrips: 0,
   })
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)